@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Compare shadowcasting FOV against walking line_of_sight to every cell.
+
+ray_fov walks the line_of_sight ray to each cell in the radius, the way
+calc_fov did before fov.py. Both run from random spots on seeded random
+maps of scattered walls and on the layers of a generated world. The two
+check the same walls, so they must see exactly the same cells; the table
+shows any cells only one of them sees and how long each took, and the
+script exits with an error if there are any, so it can be run as a check:
+python bench_fov.py [world size] [spots per map]
+"""
+import random
+import sys
+import time
+
+from fov import field_of_view, line_of_sight
+from tiles import Tile, TileID
+from world import World, make_2d_array
+
+RADIUS = 25
+DENSITIES = (0.0, 0.05, 0.15, 0.3)
+
+
+def ray_fov(tile_array, start, radius) -> set[tuple[int, int]]:
+    seen = set()
+    for x in range(start[0] - radius, start[0] + radius + 1):
+        for y in range(start[1] - radius, start[1] + radius + 1):
+            if (x - start[0]) ** 2 + (y - start[1]) ** 2 <= (radius + 0.5) ** 2 and \
+                    line_of_sight(tile_array, start, (x, y)):
+                seen.add((x, y))
+    return seen
+
+
+def random_map(size, density):
+    wall, floor = Tile(TileID.STONE), Tile(TileID.GRASS)
+    return [[wall if random.random() < density else floor for _ in range(size)] for _ in range(size)]
+
+
+def compare(name, tile_array, size, spots) -> bool:
+    """Print how the two compare on tile_array and return whether they see the same cells."""
+    only_ray = only_shadow = total = 0
+    ray_time = shadow_time = 0
+    for _ in range(spots):
+        start = random.randrange(RADIUS, size - RADIUS), random.randrange(RADIUS, size - RADIUS)
+        timer = time.perf_counter()
+        ray = ray_fov(tile_array, start, RADIUS)
+        ray_time += time.perf_counter() - timer
+        timer = time.perf_counter()
+        shadow = field_of_view(tile_array, start, RADIUS)
+        shadow_time += time.perf_counter() - timer
+        only_ray += len(ray - shadow)
+        only_shadow += len(shadow - ray)
+        total += len(ray | shadow)
+    agree = only_ray == only_shadow == 0
+    print(f"{name:14} only ray {only_ray:5}  only shadow {only_shadow:5}  of {total:6}  "
+          f"ray {ray_time * 1000 / spots:6.2f}ms  shadow {shadow_time * 1000 / spots:6.2f}ms  "
+          f"x{ray_time / shadow_time:.1f}  {'ok' if agree else 'DISAGREE'}")
+    return agree
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    spots = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(0)
+    agree = True
+    for density in DENSITIES:
+        agree &= compare(f"walls {density:.0%}", random_map(size, density), size, spots)
+    world = World((size, size), 0)
+    for _ in world.generate_layers():
+        pass
+    for index in range(5):
+        agree &= compare(f"layer {index}", world.get_layer(index).tile_array, size, spots)
+    # Nothing to see around, only the cell itself and the walls next to it.
+    empty = make_2d_array((size, size), Tile(TileID.STONE))
+    center = (size // 2, size // 2)
+    if field_of_view(empty, center, RADIUS) != ray_fov(empty, center, RADIUS):
+        print("walled in views disagree")
+        agree = False
+    if not agree:
+        sys.exit("shadowcasting and line_of_sight disagree")
+
+
+if __name__ == "__main__":
+    main()
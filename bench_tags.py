@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Time tag lookups the old way (tag in tags) against the bitmask tables.
+
+has_tag is timed with the enum lookup at each call, like most of main.py.
+tag_mask ANDs a mask looked up once, like the per-cell tests in the tick.
+
+Runs the tag tests of the world tick and of the FOV rays over a generated
+overworld layer: python bench_tags.py [world size] [repeats]
+"""
+import sys
+import timeit
+
+from data import TileTag, MobTag, MobID
+from mobs import Mob
+from world import World, OVERWORLD_LAYER
+
+SPREAD_MASK = TileTag.SPREAD.mask
+GROW_MASK = TileTag.GROW.mask
+BLOCK_SIGHT_MASK = TileTag.BLOCK_SIGHT.mask
+ALWAYS_SIM_MASK = MobTag.ALWAYS_SIM.mask
+AI_FOLLOW_MASK = MobTag.AI_FOLLOW.mask
+
+
+def old_has_tag(obj, tag) -> bool:
+    """has_tag as it was before the bitmask tables."""
+    return tag in obj.tags
+
+
+def tick_old(tile_array, size):
+    count = 0
+    for x in range(size):
+        for y in range(size):
+            tile = tile_array[x][y]
+            count += old_has_tag(tile, TileTag.SPREAD) + old_has_tag(tile, TileTag.GROW)
+    return count
+
+
+def tick_new(tile_array, size):
+    count = 0
+    for x in range(size):
+        for y in range(size):
+            tile = tile_array[x][y]
+            count += tile.has_tag(TileTag.SPREAD) + tile.has_tag(TileTag.GROW)
+    return count
+
+
+def tick_mask(tile_array, size):
+    count = 0
+    for x in range(size):
+        for y in range(size):
+            tile = tile_array[x][y]
+            count += (tile.tag_mask & SPREAD_MASK != 0) + (tile.tag_mask & GROW_MASK != 0)
+    return count
+
+
+def fov_cells(size, radius=25):
+    """Every cell on a straight line from the middle of the map to each cell in radius."""
+    center = size // 2
+    cells = []
+    for dx in range(-radius, radius + 1):
+        for dy in range(-radius, radius + 1):
+            steps = max(abs(dx), abs(dy))
+            for step in range(1, steps):
+                cells.append((center + dx * step // steps, center + dy * step // steps))
+    return cells
+
+
+def fov_old(tile_array, cells):
+    return sum(old_has_tag(tile_array[x][y], TileTag.BLOCK_SIGHT) for x, y in cells)
+
+
+def fov_new(tile_array, cells):
+    return sum(tile_array[x][y].has_tag(TileTag.BLOCK_SIGHT) for x, y in cells)
+
+
+def fov_mask(tile_array, cells):
+    return sum(tile_array[x][y].tag_mask & BLOCK_SIGHT_MASK != 0 for x, y in cells)
+
+
+def mobs_old(mobs):
+    return sum(old_has_tag(mob, MobTag.ALWAYS_SIM) + old_has_tag(mob, MobTag.AI_FOLLOW) for mob in mobs)
+
+
+def mobs_new(mobs):
+    return sum(mob.has_tag(MobTag.ALWAYS_SIM) + mob.has_tag(MobTag.AI_FOLLOW) for mob in mobs)
+
+
+def mobs_mask(mobs):
+    return sum((mob.tag_mask & ALWAYS_SIM_MASK != 0) + (mob.tag_mask & AI_FOLLOW_MASK != 0) for mob in mobs)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    world = World((size, size), 0)
+    tile_array = world.get_layer(OVERWORLD_LAYER).tile_array
+    cells = fov_cells(size)
+    mobs = [Mob(mob_id) for mob_id in MobID] * 100
+    for name, args, old, new, mask in (
+        ("tick", (tile_array, size), tick_old, tick_new, tick_mask),
+        ("fov", (tile_array, cells), fov_old, fov_new, fov_mask),
+        ("mobs", (mobs,), mobs_old, mobs_new, mobs_mask),
+    ):
+        assert old(*args) == new(*args) == mask(*args), f"{name} lookups disagree"
+        times = [min(timeit.repeat(lambda: func(*args), number=1, repeat=repeats)) for func in (old, new, mask)]
+        print(f"{name:5} tuple scan {times[0] * 1000:7.2f}ms  has_tag {times[1] * 1000:7.2f}ms  "
+              f"tag_mask {times[2] * 1000:7.2f}ms  x{times[0] / times[2]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -282,6 +282,13 @@ class MobTag(Enum):
     FURNITURE = auto()
 
 
+class MobCategory(Enum):
+    HOSTILE = auto()
+    PET = auto()
+    FURNITURE = auto()
+    OTHER = auto()
+
+
 class ItemID(Enum):
     WORKBENCH = 1
     DIRT = 2
@@ -508,3 +515,27 @@ class TileTag(Enum):
     CRUSH = auto()
     SPREAD = auto()
     DRAIN = auto()
+
+
+# Each tag gets its own bit, so the tags of an id fit in one int and a tag
+# test is a single AND.
+for tag_enum in (MobTag, ItemTag, TileTag):
+    for tag in tag_enum:
+        tag.mask = 1 << tag.value
+
+
+def tag_mask(tags: tuple[Enum, ...]) -> int:
+    """Return an int with the bit of each of tags set."""
+    mask = 0
+    for tag in tags:
+        mask |= tag.mask
+    return mask
+
+
+def tag_mask_table(data: dict) -> list[int]:
+    """Return the tag mask of each id in data, in a list indexed by id value."""
+    table = [0] * (max(key.value for key in data if key is not None) + 1)
+    for key, value in data.items():
+        if key is not None:
+            table[key.value] = tag_mask(value.tags)
+    return table
@@ -0,0 +1,214 @@
+"""Field of view by recursive shadowcasting.
+
+Each quadrant around the origin is swept a row at a time, keeping the slopes
+of the light that got past the walls so far, so every cell in the radius is
+looked at once instead of walking a ray to each of them. A cell is seen when
+the line between its center and the origin's center misses the inside of
+every wall. line_of_sight checks the cells that same line passes through
+the inside of, so the two always agree; bench_fov.py checks that they do.
+"""
+import functools
+from typing import Callable, Iterable, Iterator
+
+from data import PointType, TileTag
+from world import TileGrid, ChunkedArray, LightSource, get_array, make_2d_array, is_opaque_value, \
+    take_sight_changes
+
+BLOCK_SIGHT_MASK = TileTag.BLOCK_SIGHT.mask
+VIEW_CACHE_SIZE = 32  # views kept, enough to pace around a room and come back
+RAY_RADIUS = 25  # rays out to this far on each axis are worked out once, at import
+# How a (column, depth) in a quadrant moves x and y: north, east, south, west.
+QUADRANTS = ((1, 0, 0, -1), (0, 1, 1, 0), (1, 0, 0, 1), (0, -1, 1, 0))
+
+
+def ray_path(dx: int, dy: int) -> Iterator[tuple[int, int]]:
+    """Yield the cells line_of_sight checks between (0, 0) and (dx, dy), a row at a time.
+
+    Rows run across the longer axis, like the rows field_of_view sweeps, and
+    in each row between the two the line passes through the inside of one
+    cell, or two where it crosses into the next column. Touching a corner
+    doesn't count, as the shadow of a wall doesn't cover its edges.
+    """
+    depth, col = max(abs(dx), abs(dy)), min(abs(dx), abs(dy))
+    sign_x, sign_y = 1 if dx > 0 else -1, 1 if dy > 0 else -1
+    for row in range(1, depth):
+        # The columns whose inside the line crosses between row - 0.5 and row + 0.5.
+        first = (col * (2 * row - 1) - depth) // (2 * depth) + 1
+        last = -(-(col * (2 * row + 1) + depth) // (2 * depth)) - 1
+        for column in range(first, last + 1):
+            if abs(dy) >= abs(dx):
+                yield sign_x * column, sign_y * row
+            else:
+                yield sign_x * row, sign_y * column
+
+
+RAY_SPAN = 2 * RAY_RADIUS + 1
+# ray_paths[(dx + RAY_RADIUS) * RAY_SPAN + dy + RAY_RADIUS] is ray_path(dx, dy).
+ray_paths = [tuple(ray_path(dx, dy)) for dx in range(-RAY_RADIUS, RAY_RADIUS + 1) for dy in range(-RAY_RADIUS, RAY_RADIUS + 1)]
+
+
+def line_of_sight(tile_array, start: PointType, end: PointType) -> bool:
+    """Return whether nothing blocks sight on the cells between start and end.
+
+    Nearby rays come from ray_paths and farther ones are worked out each time.
+    The void past the edge of the layer blocks sight.
+    """
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    if -RAY_RADIUS <= dx <= RAY_RADIUS and -RAY_RADIUS <= dy <= RAY_RADIUS:
+        path = ray_paths[(dx + RAY_RADIUS) * RAY_SPAN + dy + RAY_RADIUS]
+    else:
+        path = ray_path(dx, dy)
+    x, y = start
+    if isinstance(tile_array, TileGrid):
+        # Read the ids straight from a whole layer grid, without making Tiles.
+        ids = tile_array.ids
+        width, height = tile_array.size
+        for step_x, step_y in path:
+            cell_x, cell_y = x + step_x, y + step_y
+            if not (0 <= cell_x < width and 0 <= cell_y < height) or is_opaque_value[ids[cell_x][cell_y]]:
+                return False
+        return True
+    if isinstance(tile_array, ChunkedArray):
+        width, height = tile_array.size
+        for step_x, step_y in path:
+            cell_x, cell_y = x + step_x, y + step_y
+            if not (0 <= cell_x < width and 0 <= cell_y < height) or \
+                    tile_array.get(cell_x, cell_y).tag_mask & BLOCK_SIGHT_MASK:
+                return False
+        return True
+    for step_x, step_y in path:
+        tile = get_array((x + step_x, y + step_y), tile_array)
+        if tile is None or tile.tag_mask & BLOCK_SIGHT_MASK:
+            return False
+    return True
+
+
+def field_of_view(tile_array, origin: PointType, radius: int) -> set[tuple[int, int]]:
+    """Return the cells seen from origin out to radius + 0.5.
+
+    Walls are seen but hide what is behind them, and so does the void past
+    the edge of the layer.
+    """
+    ox, oy = origin
+    reach = (radius + 0.5) ** 2
+    seen = {(ox, oy)}
+
+    def scan(cx, dx, cy, dy, depth, start_n, start_d, end_n, end_d):
+        # The light is the slopes (column / depth) from start_n / start_d to
+        # end_n / end_d, kept as integers so the edges are exact. Cells are
+        # seen if their center is lit, and walls shade all their square, so
+        # walls just off the edge still shade the light that grazes them.
+        first_col = max(-depth, -((-depth * start_n) // start_d) - 1)
+        last_col = min(depth, depth * end_n // end_d + 1)
+        for col in range(first_col, last_col + 1):
+            x = ox + col * cx + depth * dx
+            y = oy + col * cy + depth * dy
+            lit = col * start_d >= depth * start_n and col * end_d <= depth * end_n
+            if lit and (x - ox) ** 2 + (y - oy) ** 2 <= reach:
+                seen.add((x, y))
+            tile = get_array((x, y), tile_array)
+            if tile is not None and not tile.tag_mask & BLOCK_SIGHT_MASK:
+                continue
+            # The slopes of the near and far corners of the wall.
+            if col > 0:
+                low_n, low_d, high_n, high_d = 2 * col - 1, 2 * depth + 1, 2 * col + 1, 2 * depth - 1
+            elif col < 0:
+                low_n, low_d, high_n, high_d = 2 * col - 1, 2 * depth - 1, 2 * col + 1, 2 * depth + 1
+            else:
+                low_n, low_d, high_n, high_d = -1, 2 * depth - 1, 1, 2 * depth - 1
+            if low_n * end_d > end_n * low_d or high_n * start_d < start_n * high_d:
+                continue  # the wall is out of the light
+            if low_n * start_d >= start_n * low_d and depth < radius:
+                scan(cx, dx, cy, dy, depth + 1, start_n, start_d, low_n, low_d)
+            if high_n * start_d > start_n * high_d:
+                start_n, start_d = high_n, high_d
+            if start_n * end_d > end_n * start_d:
+                return  # the rest of the light is shaded
+        if depth < radius:
+            scan(cx, dx, cy, dy, depth + 1, start_n, start_d, end_n, end_d)
+
+    if radius > 0:
+        for quadrant in QUADRANTS:
+            scan(*quadrant, 1, -1, 1, 1, 1)
+    return seen
+
+
+def view_field(tile_array, origin: tuple[int, int], radius: int, opacity_version: int) -> list[list[bool]]:
+    """Return the field of view of origin as field[dx][dy], for offsets from -radius to radius.
+
+    opacity_version is the tile array's, only there to key a cache of views
+    made with view_cache(): a view is reused until a tile that blocks sight
+    changes. Cached fields are shared by the calls with the same arguments,
+    so they must not be changed.
+    """
+    field = make_2d_array((radius * 2 + 1, radius * 2 + 1), False)
+    for x, y in field_of_view(tile_array, origin, radius):
+        field[x - origin[0]][y - origin[1]] = True
+    return field
+
+
+def view_cache() -> Callable[[object, tuple[int, int], int, int], list[list[bool]]]:
+    """Return view_field with a cache of its own of the last VIEW_CACHE_SIZE views.
+
+    The cache keeps the tile arrays of its views alive, so each game makes
+    its own and it goes away with the game's world.
+    """
+    return functools.lru_cache(maxsize=VIEW_CACHE_SIZE)(view_field)
+
+
+class LightMap:
+    """How many light sources light each cell of a layer.
+
+    counts is a layer sized array of those counts, so a cell is lit when its
+    count isn't 0. The cells each source lights are kept, so update() only
+    relights the sources that were added, removed or moved, and the ones
+    within reach of a cell that started or stopped blocking sight.
+    """
+    def __init__(self, tile_array: "TileGrid | ChunkedArray", counts: "list[list[int]] | ChunkedArray"):
+        self.tile_array = tile_array
+        self.counts = counts
+        # The cells each lit source lights, and the lit sources at each position.
+        self.sources: dict[LightSource, list[tuple[int, int]]] = {}
+        self.sources_at: dict[tuple[int, int], list[LightSource]] = {}
+        # The biggest radius lit so far, how far a change to the tiles can reach.
+        self.reach = 0
+        # The cells that changed before this map was made are already in it.
+        take_sight_changes(tile_array)
+
+    def light(self, source: LightSource):
+        width, height = self.tile_array.size
+        cells = [(x, y) for x, y in field_of_view(self.tile_array, source.pos, source.radius)
+                 if 0 <= x < width and 0 <= y < height]
+        for x, y in cells:
+            self.counts[x][y] += 1
+        self.sources[source] = cells
+        self.sources_at.setdefault(source.pos, []).append(source)
+        self.reach = max(self.reach, source.radius)
+
+    def unlight(self, source: LightSource):
+        for x, y in self.sources.pop(source):
+            self.counts[x][y] -= 1
+        at_pos = self.sources_at[source.pos]
+        at_pos.remove(source)
+        if not at_pos:
+            del self.sources_at[source.pos]
+
+    def update(self, sources: Iterable[LightSource]):
+        """Light the given sources, and only those."""
+        sources = set(sources)
+        for source in self.sources.keys() - sources:
+            self.unlight(source)
+        # A source only looks at the cells in the square around it, out to its
+        # radius, so only those with a changed cell in their square are redone.
+        redo = set()
+        for x, y in take_sight_changes(self.tile_array):
+            for source_x in range(x - self.reach, x + self.reach + 1):
+                for source_y in range(y - self.reach, y + self.reach + 1):
+                    for source in self.sources_at.get((source_x, source_y), ()):
+                        if abs(x - source_x) <= source.radius and abs(y - source_y) <= source.radius:
+                            redo.add(source)
+        for source in redo:
+            self.unlight(source)
+        for source in sources:
+            if source not in self.sources:
+                self.light(source)
@@ -1,7 +1,7 @@
 from collections import namedtuple, defaultdict
 from enum import Enum, auto
 
-from data import Color, Graphic, MobID, ItemID, ItemTag, TileID
+from data import Color, Graphic, MobID, ItemID, ItemTag, TileID, tag_mask_table
 
 
 class PotionEffect(Enum):
@@ -784,6 +784,9 @@ item_data = {
 }
 
 
+item_tag_masks = tag_mask_table(item_data)
+
+
 class Item:
     def __init__(self, itemid: ItemID, count: int = 1):
         self.id = itemid
@@ -791,12 +794,13 @@ class Item:
         self.name = self.item_data.name
         self.graphic = self.item_data.graphic
         self.tags = self.item_data.tags
+        self.tag_mask = item_tag_masks[self.id.value]
         self.stackable = ItemTag.STACKABLE in self.tags
         self.count = count
         self.data = self.item_data.data
 
     def has_tag(self, tag: ItemTag) -> bool:
-        return tag in self.tags
+        return self.tag_mask & tag.mask != 0
 
     def __str__(self):
         return (f"{self.count} " if self.stackable else "") + self.name
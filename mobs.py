@@ -1,6 +1,6 @@
 from collections import namedtuple, defaultdict
 
-from data import Color, Graphic, MobID, MobTag, Point
+from data import Color, Graphic, MobID, MobTag, MobCategory, Point, tag_mask_table
 from items import ItemID
 
 
@@ -282,6 +282,31 @@ mob_data = {
 }
 
 
+mob_tag_masks = tag_mask_table(mob_data)
+
+# The mobs counted against the mob cap.
+hostile_mobs = (MobID.BAT, MobID.SHADE, MobID.FLAME_SKULL, MobID.FAIRY, MobID.SPIDER, MobID.HELL_SPIDER,
+                MobID.CLOUD_SPIDER, MobID.UFO, MobID.DEVIL,
+                MobID.GREEN_ZOMBIE, MobID.GREEN_SLIME, MobID.GREEN_SKELETON,
+                MobID.RED_ZOMBIE, MobID.RED_SLIME, MobID.RED_SKELETON,
+                MobID.WHITE_ZOMBIE, MobID.WHITE_SLIME, MobID.WHITE_SKELETON,
+                MobID.BLACK_ZOMBIE, MobID.BLACK_SLIME, MobID.BLACK_SKELETON,
+                )
+
+
+def categorize(mob_id: MobID) -> MobCategory:
+    if mob_id in hostile_mobs:
+        return MobCategory.HOSTILE
+    if MobTag.SWAPPABLE in mob_data[mob_id].tags:
+        return MobCategory.PET
+    if MobTag.FURNITURE in mob_data[mob_id].tags:
+        return MobCategory.FURNITURE
+    return MobCategory.OTHER
+
+
+mob_category = {mob_id: categorize(mob_id) for mob_id in mob_data}
+
+
 class Mob:
     def __init__(self, mobid: MobID):
         self.id = mobid
@@ -291,6 +316,7 @@ class Mob:
         self.max_health = self.mob_data.max_health
         self.health = self.max_health
         self.tags = self.mob_data.tags
+        self.tag_mask = mob_tag_masks[self.id.value]
         self.recipies = self.mob_data.recipies
         self.light = self.mob_data.light
         self.target_space = None
@@ -304,4 +330,4 @@ class Mob:
         self.fuse = 0
 
     def has_tag(self, tag: MobTag) -> bool:
-        return tag in self.tags
+        return self.tag_mask & tag.mask != 0
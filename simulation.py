@@ -0,0 +1,1667 @@
+"""The game without the window: the world, the player and the turns.
+
+A Simulation takes the player's Actions and ticks the world. main.py draws
+it and turns key presses into Actions, but it runs the same without pygame,
+so bots, replays and benchmarks can play it at full speed.
+"""
+import math
+import random
+from collections import deque
+from enum import Enum, auto, StrEnum
+from typing import Sequence
+
+from world import World, set_array, get_array, damage_tile, active_cells, tick_growth, spread_frontier, \
+    spread_cells, opacity_version, light_sources
+from data import Point, PointType, ItemID, ItemTag, TileTag, MobID, MobTag, MobCategory
+from items import Item, item_to_mob, item_light, item_effects, PotionEffect, effect_names
+from mobs import Mob, mob_damage, mob_explosion, mob_explode_dmg
+from tiles import Tile, tile_replace, tile_damage, TileID, tile_grow, tile_spread, tile_drain
+from loots import tile_break_loot, resolve_loot, mob_death_loot, fishing_loot
+from fov import LightMap, view_cache, line_of_sight
+
+
+def distance_within(a: PointType, b: PointType, dist: int | float) -> bool:
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 <= dist ** 2
+
+
+def distance_squared(a: PointType, b: PointType) -> float | int:
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2
+
+
+def towards(a: PointType, b: PointType) -> Point:
+    """The offset from a to b; the mob AI only looks at its signs and its longest axis."""
+    return Point(b[0] - a[0], b[1] - a[1])
+
+
+class GameMode(Enum):
+    MOVE = auto()
+    INVENTORY = auto()
+    CRAFT = auto()
+
+
+class Sound(StrEnum):
+    HURT = "hurt"
+    HEAL = "heal"
+    FAILURE = "failure"
+    SUCCESS = "success"
+    USE_ITEM = "use_item"
+    INDICATOR = "indicator"
+    HURT_ENEMY = "hurt_enemy"
+    EXPLOSION = "explosion"
+    VICTORY = "victory"
+
+
+class Action(Enum):
+    UP = auto()
+    DOWN = auto()
+    LEFT = auto()
+    RIGHT = auto()
+    USE = auto()  # use the current item, or pick in a menu
+    INTERACT = auto()  # craft, sleep, open doors and the inventory, or leave a menu
+    WAIT = auto()  # wait a turn or take the staircase
+
+
+NO_ITEM = Item(ItemID.EMPTY_HANDS)
+
+MOB_SIM_DISTANCE = 25
+MAX_VIEW_DIST = 25
+CHASE_DISTANCE = 10  # when zombies sense you
+JUMP_DISTANCE = 8  # when slimes sense you
+SKELETON_SHOOT_RADIUS = 5
+SKELETON_SIGHT_RADIUS = 12  # when skeletons sense you
+SPIDER_CHASE_RADIUS = 10  # when spiders sense you
+SHADE_FLEE_RADIUS = 5  # when shades flee you instead of wandering
+DOG_FOLLOW_RADIUS = 12  # when pets follow you instead of wandering
+DEVIL_EXPLODE_RADIUS = 3.5  # when devils start ticking down
+INVIS_SENSE_DISTANCE = 1.5  # when enemies sense the invisible you; spiders and air wizard always sense you
+TICK_BUDGET = 8  # default ms of world tick a front end works on each frame, the rest waits for the next frames
+CELLULAR_SPREAD = False  # spread tiles with whole-area array steps instead of walking the spread frontier
+MOB_DESPAWN_CHANCE = 0.05  # per daylight tick, for overworld and sky mobs
+DESPAWN_SWEEP_BUCKETS = 8  # mob buckets outside the bubble that make up their missed despawns each tick
+PLAYER_LIGHT_RADIUS = 2.5
+# Masks of the tags tested on every cell each tick, so those tests are one AND.
+SPREAD_MASK = TileTag.SPREAD.mask
+LIGHT_MASK = TileTag.LIGHT.mask
+BLOCK_SIGHT_MASK = TileTag.BLOCK_SIGHT.mask
+
+action_directions = {
+    Action.UP: Point(0, -1),
+    Action.DOWN: Point(0, 1),
+    Action.LEFT: Point(-1, 0),
+    Action.RIGHT: Point(1, 0),
+}
+
+mob_spawn_per_layer = {
+    0: (MobID.BLACK_ZOMBIE, MobID.BLACK_SLIME, MobID.BLACK_SKELETON, MobID.FAIRY),
+    1: (MobID.GREEN_ZOMBIE, MobID.GREEN_SLIME, MobID.GREEN_SKELETON),
+    2: (MobID.GREEN_ZOMBIE, MobID.GREEN_SLIME, MobID.GREEN_SKELETON,
+        MobID.RED_ZOMBIE, MobID.RED_SLIME, MobID.RED_SKELETON, MobID.BAT,
+        ),
+    3: (MobID.GREEN_ZOMBIE, MobID.GREEN_SLIME, MobID.GREEN_SKELETON,
+        MobID.RED_ZOMBIE, MobID.RED_SLIME, MobID.RED_SKELETON, MobID.BAT,
+        MobID.WHITE_ZOMBIE, MobID.WHITE_SLIME, MobID.WHITE_SKELETON, MobID.SHADE,
+        ),
+    4: (MobID.GREEN_ZOMBIE, MobID.GREEN_SLIME, MobID.GREEN_SKELETON,
+        MobID.RED_ZOMBIE, MobID.RED_SLIME, MobID.RED_SKELETON, MobID.BAT,
+        MobID.WHITE_ZOMBIE, MobID.WHITE_SLIME, MobID.WHITE_SKELETON, MobID.SHADE,
+        MobID.BLACK_ZOMBIE, MobID.BLACK_SLIME, MobID.BLACK_SKELETON, MobID.FLAME_SKULL,
+        MobID.BAT, MobID.SHADE, MobID.FLAME_SKULL, MobID.DEVIL, MobID.DEVIL,
+        ),
+}
+
+
+def add_to_inventory(item: Item, invent: list[Item]) -> None:
+    if item.has_tag(ItemTag.STACKABLE):
+        for invent_item in invent:
+            if invent_item.id is item.id:
+                invent_item.count += item.count
+                break
+        else:
+            invent.insert(0, item)
+    else:
+        invent.insert(0, item)
+
+
+def remove_from_inventory(item: tuple[ItemID, int], invent: list[Item]) -> Item | None:
+    for index, invent_item in enumerate(invent):
+        if invent_item.id is item[0]:
+            if not invent_item.has_tag(ItemTag.STACKABLE):
+                return invent.pop(index)
+            else:
+                invent_item.count -= item[1]
+                if invent_item.count <= 0:
+                    return invent.pop(index)
+                return
+
+
+def inventory_count(item_id: ItemID, invent: list[Item]) -> int:
+    count = 0
+    for item in invent:
+        if item.id == item_id:
+            count += item.count
+    return count
+
+
+def craftable(needed: Sequence[tuple[ItemID, int]],
+              have: list[Item]) -> bool:
+    for item_id, count in needed:
+        for item in have:
+            if item.id is item_id and item.count >= count:
+                break
+        else:
+            return False
+    return True
+
+
+class Simulation:
+    """A game in progress on game_world, played one Action at a time.
+
+    step() does what the player does and says if it took a turn, and tick()
+    then runs the world's turn. The state is all on the attributes for the
+    front end to draw; it also plays sounds_to_play and changes the music
+    when music_changed is set, clearing both.
+    """
+
+    def __init__(self, game_world: World, settings: dict):
+        self.game_world = game_world
+        self.world_size = Point(*game_world.size)
+
+        self.world_time = 0
+        self.daylight_time = 0  # ticks that weren't night, for the layers the player is away from
+        self.day_cycle_timer = self.world_time
+        self.day_cycle_length = settings["day_cycle_len"]
+        self.night_time = False
+        self.level_is_dark = False
+        self.mob_spawn_chance = settings["mob_spawn"]
+        # How many ms of tick_slices a front end runs each frame.
+        self.tick_budget = settings.get("tick_budget", TICK_BUDGET)
+
+        self.current_layer_index = 1
+        self.current_layer = game_world.get_layer(self.current_layer_index)
+        game_world.prebuild_layer(self.current_layer_index + 1)
+
+        self.do_calc_light_map = True
+        # The player's recent views, kept with this game so they go when its world does.
+        self.view_field = view_cache()
+        self.lights: LightMap | None = None
+        self.light_map: list[list[int]] = []  # how many lights light each cell
+        self.lit_area = None
+        self.magic_eye_used = False
+        self.player_health = 10
+        self.player_stamina = 10
+        self.regen_stam = True
+        self.player_dir = Point(0, -1)
+        self.player_pos = (0, 0)
+        while self.player_pos == (0, 0):
+            x_range = (18, self.world_size.x - 19)
+            y_range = (18, self.world_size.y - 19)
+            try_spawn = Point(random.randint(*x_range), random.randint(*y_range))
+            try_tile = get_array(try_spawn, self.current_layer.tile_array)
+            if try_tile.has_tag(TileTag.BLOCK_MOVE) or try_tile.has_tag(TileTag.LIQUID):
+                continue
+            self.player_pos = try_spawn
+            set_array(self.player_pos, self.current_layer.mob_array, Mob(MobID.PLAYER))
+            break
+
+        self.wizard_mode = settings["wizard"]
+        self.player_is_dead = False
+        self.never_been_to_sky = True
+        self.air_wizard_defeated = False
+        self.current_item: Item | NO_ITEM = NO_ITEM
+        self.inventory: list[Item] = [Item(ItemID.WORKBENCH),
+                                      # Item(ItemID.GEM_PICK), Item(ItemID.GEM_SWORD),
+                                      # Item(ItemID.GEM_AXE, 1), Item(ItemID.IRONSKIN_POTION, 99),
+                                      # Item(ItemID.GEM_SHOVEL, 1), Item(ItemID.MAGIC_EYE, 99),
+                                      # Item(ItemID.OBSIDIAN_DOOR, 100), Item(ItemID.OBSIDIAN_FLOOR, 99),
+                                      # Item(ItemID.CAULDRON, 1), Item(ItemID.SCRINIUM, 1),
+                                      # Item(ItemID.SKY_WINDOW, 100), Item(ItemID.CLOUD_DOOR, 99),
+                                      # Item(ItemID.CLOUD_FLOOR, 99), Item(ItemID.CLOUD_BRICKS, 99),
+                                      ]
+
+        if self.wizard_mode:
+            self.inventory = []
+            for item_id in ItemID:
+                self.inventory.append(Item(item_id, 999))
+
+        self.message_logs: deque[str] = deque(maxlen=10)
+        self.show_controls()
+
+        self.game_mode = GameMode.MOVE
+        self.cursor_index = 0  # what inventory item it is on
+
+        self.current_crafter = None  # the current crafting station in use
+        self.crafting_list = None  # the list of recipies
+        self.current_effects: dict[PotionEffect, int] = {}  # the key is what effect we've got, value is remaining time
+
+        self.just_broken_a_tile = False
+        self.displayed_empty_hands_message = False
+        self.just_placed_a_tile = False
+        self.displayed_no_use_message = False
+
+        self.sounds_to_play: set[Sound] = set()
+        self.music_changed = False
+
+        self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+        self.update()
+
+    @property
+    def light_radius(self) -> float:
+        """How far the player lights around them, with the light of the current item."""
+        if self.current_item.has_tag(ItemTag.LIGHT):
+            return item_light[self.current_item.id] + 0.5
+        return PLAYER_LIGHT_RADIUS
+
+    def show_controls(self):
+        self.message_logs.appendleft("the controls")
+        self.message_logs.appendleft("escape to quit")
+        self.message_logs.appendleft("arrows to move")
+        self.message_logs.appendleft("c to use item")
+        self.message_logs.appendleft("x to interact")
+        self.message_logs.appendleft("z to wait or")
+        self.message_logs.appendleft("use staircases")
+        self.message_logs.appendleft("m-toggle music")
+        self.message_logs.appendleft("n-toggle sound")
+        self.message_logs.appendleft("h-show controls")
+
+        if self.wizard_mode:
+            self.message_logs.appendleft("f-toggle fov")
+            self.message_logs.appendleft("space-toggle")
+            self.message_logs.appendleft("level darkness")
+
+    def step(self, action: Action) -> bool:
+        """Do the player's action and return whether it took a turn, so tick() should run."""
+        if self.player_is_dead:
+            return False
+        took_turn = False
+        if action in action_directions:
+            took_turn = self.press_direction(action_directions[action])
+        elif action is Action.USE:
+            took_turn = self.use_item()
+        elif action is Action.INTERACT:
+            self.interact()
+        elif action is Action.WAIT:
+            took_turn = self.wait()
+        self.update()
+        return took_turn
+
+    def press_direction(self, direction: Point) -> bool:
+        if self.game_mode is GameMode.MOVE:
+            if self.player_dir == direction:
+                self.player_pos = self.move_player(direction)
+                self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+                return True
+            self.player_dir = direction
+        elif self.game_mode is GameMode.INVENTORY:
+            self.cursor_index += direction.x + direction.y
+            self.cursor_index %= len(self.inventory)
+        else:
+            self.cursor_index += direction.x + direction.y
+            self.cursor_index %= len(self.crafting_list)
+        return False
+
+    def use_item(self) -> bool:
+        took_turn = False
+        if self.game_mode is GameMode.MOVE:
+            took_turn = True
+            target_pos = Point(self.player_pos.x + self.player_dir.x,
+                               self.player_pos.y + self.player_dir.y)
+            target_mob = get_array(target_pos,
+                                   self.current_layer.mob_array)
+            target_tile = get_array(target_pos,
+                                    self.current_layer.tile_array)
+            if self.current_item.id == ItemID.SPACESHIP:
+                self.message_logs.appendleft("you fly away in")
+                self.message_logs.appendleft("the vehicle and")
+                self.message_logs.appendleft("leave the world")
+                self.message_logs.appendleft("press escape")
+                self.sounds_to_play.add(Sound.VICTORY)
+                self.player_is_dead = True
+            if self.current_item.id == ItemID.FERTILIZER:
+                if target_tile.has_tag(TileTag.GROW):
+                    grow_tile = Tile(tile_grow[target_tile.id][0])
+                    set_array(target_pos, self.current_layer.tile_array, grow_tile)
+                    self.message_logs.appendleft("you grow the")
+                    self.message_logs.appendleft(f"{grow_tile.name}")
+                    if grow_tile.has_tag(TileTag.BLOCK_SIGHT) ^ target_tile.has_tag(TileTag.BLOCK_SIGHT):
+                        self.do_calc_light_map = True
+                        self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+                    if grow_tile.has_tag(TileTag.LIGHT) or target_tile.has_tag(TileTag.LIGHT):
+                        self.do_calc_light_map = True
+                    self.current_item.count -= 1
+                    if self.current_item.count <= 0:
+                        self.inventory.remove(NO_ITEM)
+                        self.current_item = NO_ITEM
+                        self.displayed_empty_hands_message = True
+                else:
+                    self.message_logs.appendleft("you cannot use")
+                    self.message_logs.appendleft("fertilizer here")
+            if self.current_item.tags == (ItemTag.STACKABLE,) and self.current_item.id != ItemID.FERTILIZER:
+                if self.current_item.id == ItemID.BOOK:
+                    self.message_logs.appendleft("the pages are")
+                    self.message_logs.appendleft("all blank")
+                elif self.current_item.id == ItemID.MAGIC_EYE:
+                    self.message_logs.appendleft(f"the {self.current_item.name}")
+                    self.message_logs.appendleft("reveals all")
+                    self.magic_eye_used = True
+                    self.current_item.count -= 1
+                    if self.current_item.count <= 0:
+                        self.inventory.remove(NO_ITEM)
+                        self.current_item = NO_ITEM
+                        self.displayed_empty_hands_message = True
+                else:
+                    self.message_logs.appendleft("you cannot use")
+                    self.message_logs.appendleft(f"the {self.current_item.name}")
+                self.sounds_to_play.add(Sound.FAILURE)
+            if self.current_item is NO_ITEM and target_mob is None and \
+                    target_tile.id not in self.current_item.data["breakable"]:
+                self.message_logs.appendleft("your hands are")
+                self.message_logs.appendleft("empty")
+                self.displayed_empty_hands_message = True
+                self.sounds_to_play.add(Sound.FAILURE)
+            if self.current_item.has_tag(ItemTag.SPAWN_MOB):
+                # if there is no mob, spawn one in
+                mob = Mob(self.current_item.data["mobid"])
+                if target_mob is None and \
+                        not target_tile.has_tag(TileTag.BLOCK_MOVE) and \
+                        not target_tile.has_tag(TileTag.LIQUID):
+                    if self.reduce_stamina(1):
+                        set_array(target_pos,
+                                  self.current_layer.mob_array, mob)
+                        self.current_item.count -= 1
+                        if self.current_item.count <= 0:
+                            self.current_item = NO_ITEM
+                            self.inventory.remove(NO_ITEM)
+                            self.displayed_empty_hands_message = True
+                        self.message_logs.appendleft("you place the")
+                        self.message_logs.appendleft(f"{mob.name}")
+                        self.sounds_to_play.add(Sound.SUCCESS)
+                        if mob.light > 0:
+                            self.do_calc_light_map = True
+                    else:
+                        self.message_logs.appendleft("you do not have")
+                        self.message_logs.appendleft("the stamina")
+                        self.sounds_to_play.add(Sound.FAILURE)
+                else:
+                    self.message_logs.appendleft("you cannot put")
+                    self.message_logs.appendleft(f"{mob.name} here")
+                    self.sounds_to_play.add(Sound.FAILURE)
+            if self.current_item.has_tag(ItemTag.PICKUP):
+                if target_mob is not None:
+                    item = item_to_mob[target_mob.id]
+                    if item is not None:
+                        if self.reduce_stamina(1):
+                            item = Item(item)
+                            add_to_inventory(self.current_item, self.inventory)
+                            self.current_item = item
+                            set_array(target_pos,
+                                      self.current_layer.mob_array,
+                                      None)
+                            self.message_logs.appendleft("you pick up the")
+                            self.message_logs.appendleft(f"{item.name}")
+                            if target_mob.light > 0:
+                                self.do_calc_light_map = True
+                            self.sounds_to_play.add(Sound.SUCCESS)
+                        else:
+                            self.message_logs.appendleft("you do not have")
+                            self.message_logs.appendleft("the stamina")
+                            self.sounds_to_play.add(Sound.FAILURE)
+            if self.current_item.has_tag(ItemTag.HEAL):
+                if self.player_health < 10:
+                    if self.reduce_stamina(self.current_item.data["stamina_cost"]):
+                        prev_ph = self.player_health
+                        self.player_health += self.current_item.data["heal"]
+                        self.player_health = min(10, self.player_health)
+                        self.player_health = max(0, self.player_health)
+                        self.current_item.count -= 1
+                        self.message_logs.appendleft("you eat the")
+                        if self.player_health - prev_ph >= 0:
+                            self.message_logs.appendleft(f"{self.current_item.name} "
+                                                    f"+{self.player_health - prev_ph}H")
+                            self.sounds_to_play.add(Sound.HEAL)
+                        else:
+                            self.message_logs.appendleft(f"{self.current_item.name} {self.player_health - prev_ph}H")
+                            self.sounds_to_play.add(Sound.HURT)
+                        if self.current_item.count <= 0:
+                            self.current_item = NO_ITEM
+                            self.inventory.remove(NO_ITEM)
+                            self.displayed_empty_hands_message = True
+                    else:
+                        self.message_logs.appendleft("you do not have")
+                        self.message_logs.appendleft("the stamina")
+                        self.sounds_to_play.add(Sound.FAILURE)
+                else:
+                    self.message_logs.appendleft("you have full")
+                    self.message_logs.appendleft("health points")
+            if self.current_item.has_tag(ItemTag.STAMINA):
+                if self.player_stamina < 10:
+                    prev_ps = self.player_stamina
+                    self.player_stamina += self.current_item.data["stamina"]
+                    self.player_stamina = min(10, self.player_stamina)
+                    self.current_item.count -= 1
+                    self.message_logs.appendleft("you eat the")
+                    self.message_logs.appendleft(f"{self.current_item.name} "
+                                            f"+{self.player_stamina - prev_ps}S")
+                    self.sounds_to_play.add(Sound.HEAL)
+                    self.regen_stam = False
+                    if self.current_item.count <= 0:
+                        self.current_item = NO_ITEM
+                        self.inventory.remove(NO_ITEM)
+                        self.displayed_empty_hands_message = True
+                else:
+                    self.message_logs.appendleft("you have full")
+                    self.message_logs.appendleft("stamina points")
+            if self.current_item.has_tag(ItemTag.PLACE_TILE):
+                if target_tile is not None and \
+                        target_tile.id in self.current_item.data["base"]:
+                    stam_reduce = 1 if self.current_item.has_tag(ItemTag.STACKABLE)\
+                        else self.current_item.data["stamina_cost"]
+                    if self.reduce_stamina(stam_reduce):
+                        self.just_placed_a_tile = True
+                        tile = Tile(self.current_item.data["place"])
+                        if self.current_item.id == ItemID.WEB_STAFF and target_tile.id == TileID.CLOUD:
+                            tile = Tile(TileID.SKY_WEBS)
+                        set_array(target_pos,
+                                  self.current_layer.tile_array, tile)
+                        self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+                        if tile.has_tag(TileTag.BLOCK_SIGHT) ^ target_tile.has_tag(TileTag.BLOCK_SIGHT):
+                            self.do_calc_light_map = True
+                        if tile.has_tag(TileTag.LIGHT) or target_tile.has_tag(TileTag.LIGHT):
+                            self.do_calc_light_map = True
+                        if not self.current_item.has_tag(ItemTag.STACKABLE):
+                            self.message_logs.appendleft("you use the")
+                            self.message_logs.appendleft(f"{self.current_item.name}")
+                        else:
+                            self.message_logs.appendleft("you place the")
+                            self.message_logs.appendleft(f"{self.current_item.name}")
+                        self.current_item.count -= 1
+                        if not self.current_item.has_tag(ItemTag.STACKABLE):
+                            self.current_item.count = 1
+                        if self.current_item.count <= 0:
+                            self.current_item = NO_ITEM
+                            self.inventory.remove(NO_ITEM)
+                            self.displayed_empty_hands_message = True
+                        if self.current_item.id in (ItemID.WATER_BUCKET, ItemID.LAVA_BUCKET):
+                            self.current_item = Item(ItemID.BUCKET)
+                        self.sounds_to_play.add(Sound.USE_ITEM)
+                    else:
+                        self.displayed_no_use_message = True
+                        self.message_logs.appendleft("you do not have")
+                        self.message_logs.appendleft("the stamina")
+                        self.sounds_to_play.add(Sound.FAILURE)
+                else:
+                    self.displayed_no_use_message = True
+                    if self.current_item.has_tag(ItemTag.STACKABLE):
+                        self.message_logs.appendleft("you cannot put")
+                        self.message_logs.appendleft(f"{self.current_item.name} here")
+                    else:
+                        self.message_logs.appendleft("you cannot use")
+                        self.message_logs.appendleft(f"{self.current_item.name} here")
+                    self.sounds_to_play.add(Sound.FAILURE)
+                    if self.current_item.has_tag(ItemTag.BREAK_TILE) and target_tile is not None and\
+                        target_tile.id in self.current_item.data["breakable"]:
+                        self.displayed_no_use_message = False
+                        self.message_logs.popleft()
+                        self.message_logs.popleft()
+                        self.sounds_to_play.remove(Sound.FAILURE)
+            if self.current_item.has_tag(ItemTag.BREAK_TILE):
+                if not (self.current_item.has_tag(ItemTag.DAMAGE_MOBS) and target_mob) and \
+                        not self.just_placed_a_tile and not self.displayed_no_use_message:
+                    if target_tile is not None:
+                        if target_tile.id in self.current_item.data["breakable"]:
+                            stam_cost = self.current_item.data["stamina_cost"]
+                            if self.reduce_stamina(stam_cost):
+                                damage = self.current_item.data["tile_damage"]
+                                target_tile = damage_tile(target_pos, self.current_layer.tile_array, damage)
+                                self.sounds_to_play.add(Sound.USE_ITEM)
+                                if target_tile.health > 0:
+                                    self.message_logs.appendleft("you strike the")
+                                    self.message_logs.appendleft(f"{target_tile.name} "
+                                                            f"{target_tile.health}/"
+                                                            f"{target_tile.max_health}")
+                                else:
+                                    tile = Tile(tile_replace[target_tile.id])
+                                    loot = resolve_loot(
+                                        tile_break_loot[target_tile.id])
+                                    set_array(target_pos,
+                                              self.current_layer.tile_array, tile)
+                                    self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+                                    if tile.has_tag(TileTag.BLOCK_SIGHT) ^ \
+                                            target_tile.has_tag(TileTag.BLOCK_SIGHT):
+                                        self.do_calc_light_map = True
+                                    if tile.has_tag(TileTag.LIGHT) or target_tile.has_tag(TileTag.LIGHT):
+                                        self.do_calc_light_map = True
+                                    for item in loot:
+                                        add_to_inventory(item, self.inventory)
+                                    self.message_logs.appendleft("you remove the")
+                                    self.message_logs.appendleft(f"{target_tile.name}")
+                                    if self.current_item.id == ItemID.BUCKET:
+                                        if target_tile.id == TileID.WATER:
+                                            self.current_item = Item(ItemID.WATER_BUCKET)
+                                        elif target_tile.id == TileID.LAVA:
+                                            self.current_item = Item(ItemID.LAVA_BUCKET)
+                                        else:
+                                            raise ValueError("bucket was just used on a non-liquid")
+                                self.just_broken_a_tile = True
+                            else:
+                                self.message_logs.appendleft("you do not have")
+                                self.message_logs.appendleft("the stamina")
+                                self.sounds_to_play.add(Sound.FAILURE)
+                        elif self.displayed_empty_hands_message is False and not \
+                                self.current_item.has_tag(ItemTag.DAMAGE_MOBS):
+                            self.message_logs.appendleft("you cannot use")
+                            self.message_logs.appendleft(f"{self.current_item.name}")
+                            self.sounds_to_play.add(Sound.FAILURE)
+                    else:
+                        self.message_logs.appendleft("the unfeeling")
+                        self.message_logs.appendleft("void mocks you")
+                        self.sounds_to_play.add(Sound.FAILURE)
+            if self.current_item.has_tag(ItemTag.DAMAGE_MOBS):
+                if not self.just_broken_a_tile:
+                    if target_mob is not None and not target_mob.has_tag(MobTag.FURNITURE):
+                        stam_cost = self.current_item.data["stamina_cost"]
+                        if self.reduce_stamina(stam_cost):
+                            damage = self.current_item.data["mob_damage"]
+                            target_mob.health -= damage
+                            self.sounds_to_play.add(Sound.HURT_ENEMY)
+                            if target_mob.health <= 0:
+                                set_array(target_pos,
+                                          self.current_layer.mob_array,
+                                          None)
+                                if target_mob.light > 0:
+                                    self.do_calc_light_map = True
+                                loot = resolve_loot(mob_death_loot[target_mob.id])
+                                for item in loot:
+                                    add_to_inventory(item, self.inventory)
+                                self.message_logs.appendleft("you kill the")
+                                self.message_logs.appendleft(f"{target_mob.name}")
+                                if target_mob.id == MobID.AIR_WIZARD:
+                                    self.air_wizard_defeated = True
+                                    self.message_logs.appendleft("you have won")
+                                    self.message_logs.appendleft("the game")
+                                    self.message_logs.appendleft("there is more")
+                                    self.message_logs.appendleft("to discover")
+                                    self.message_logs.appendleft("keep playing to")
+                                    self.message_logs.appendleft("find everything")
+                                    self.sounds_to_play.add(Sound.VICTORY)
+                            else:
+                                self.message_logs.appendleft("you strike the")
+                                self.message_logs.appendleft(f"{target_mob.name} "
+                                                        f"{target_mob.health}/{target_mob.max_health}")
+                        else:
+                            self.message_logs.appendleft("you do not have")
+                            self.message_logs.appendleft("the stamina")
+                            self.sounds_to_play.add(Sound.FAILURE)
+                    elif self.displayed_empty_hands_message is False:
+                        self.message_logs.appendleft("you strike at")
+                        self.message_logs.appendleft("air uselessly")
+                        self.sounds_to_play.add(Sound.FAILURE)
+            if self.current_item.has_tag(ItemTag.FISH):
+                if target_tile is not None and target_tile.id in self.current_item.data["fishable"]:
+                    if self.reduce_stamina(self.current_item.data["stamina_cost"]):
+                        if random.random() < self.current_item.data["fish_chance"]:
+                            loot = Item(random.choice(fishing_loot[target_tile.id]).id)
+                            add_to_inventory(loot, self.inventory)
+                            self.message_logs.appendleft("you fish and")
+                            self.message_logs.appendleft(f"catch {loot.name}")
+                            self.sounds_to_play.add(Sound.SUCCESS)
+                        else:
+                            self.message_logs.appendleft("you fish and")
+                            self.message_logs.appendleft("catch nothing")
+                            self.sounds_to_play.add(Sound.USE_ITEM)
+                    else:
+                        self.message_logs.appendleft("you do not have")
+                        self.message_logs.appendleft("the stamina")
+                        self.sounds_to_play.add(Sound.FAILURE)
+                else:
+                    tile_name = "the void" if target_tile is None else target_tile.name
+                    self.message_logs.appendleft("you cannot fish")
+                    self.message_logs.appendleft(f"in {tile_name}")
+                    self.sounds_to_play.add(Sound.FAILURE)
+            if self.current_item.has_tag(ItemTag.POTION):
+                for effect in item_effects[self.current_item.id]:
+                    effect_id, duration = effect
+                    self.current_effects[effect_id] = max(duration, self.current_effects.get(effect_id, 0))
+                # Remove redundant skin potions.
+                detect_skin_replacement = len(self.current_effects)
+                for effect_id in tuple(self.current_effects.keys()):
+                    if effect_id == PotionEffect.ARMOR3:
+                        self.current_effects.pop(PotionEffect.ARMOR2, None)
+                        self.current_effects.pop(PotionEffect.ARMOR, None)
+                    elif effect_id == PotionEffect.ARMOR2:
+                        self.current_effects.pop(PotionEffect.ARMOR, None)
+                if len(self.current_effects) < detect_skin_replacement:
+                    self.message_logs.appendleft("better skin")
+                    self.message_logs.appendleft("potion applied")
+                add_to_inventory(Item(ItemID.BOTTLE), self.inventory)
+                self.player_stamina -= 1
+                self.player_stamina = max(0, self.player_stamina)
+                self.current_item.count -= 1
+                if self.current_item.count <= 0:
+                    self.inventory.remove(NO_ITEM)
+                    self.current_item = NO_ITEM
+                self.sounds_to_play.add(Sound.SUCCESS)
+            self.just_broken_a_tile = False
+            self.displayed_empty_hands_message = False
+            self.displayed_no_use_message = False
+            self.just_placed_a_tile = False
+        elif self.game_mode is GameMode.INVENTORY:
+            item = self.inventory.pop(self.cursor_index)
+            add_to_inventory(self.current_item, self.inventory)
+            self.current_item = item
+            # back to move mode
+            self.cursor_index = 0
+            self.game_mode = GameMode.MOVE
+            self.sounds_to_play.add(Sound.SUCCESS)
+        else:
+            ingredients = self.crafting_list[self.cursor_index][1:]
+            if craftable(ingredients, self.inventory):
+                # remove ingredients
+                for needed_item in ingredients:
+                    remove_from_inventory(needed_item, self.inventory)
+                # add the result item
+                item = Item(*self.crafting_list[self.cursor_index][0])
+                add_to_inventory(item, self.inventory)
+                # alert the player that it worked
+                self.message_logs.appendleft("you crafted")
+                self.message_logs.appendleft(f"{item}")
+                self.sounds_to_play.add(Sound.SUCCESS)
+            else:
+                craft_item = Item(*self.crafting_list[self.cursor_index][0])
+                self.message_logs.appendleft("you cant craft")
+                self.message_logs.appendleft(f"{craft_item}")
+                self.sounds_to_play.add(Sound.FAILURE)
+        return took_turn
+
+    def interact(self):
+        if self.game_mode is GameMode.INVENTORY or self.game_mode is GameMode.CRAFT:
+            # Cancel crafting or inventory.
+            self.current_crafter = None
+            self.crafting_list = None
+            self.cursor_index = 0
+            self.game_mode = GameMode.MOVE
+            self.sounds_to_play.add(Sound.FAILURE)
+        else:
+            # We must be in move mode.
+            target_pos = Point(self.player_pos.x + self.player_dir.x,
+                               self.player_pos.y + self.player_dir.y)
+            target_mob = get_array(target_pos,
+                                   self.current_layer.mob_array)
+            target_tile = get_array(target_pos,
+                                    self.current_layer.tile_array)
+            if target_mob and target_mob.has_tag(MobTag.CRAFTING):
+                self.game_mode = GameMode.CRAFT
+                self.current_crafter = target_mob
+                self.crafting_list = self.current_crafter.recipies
+                self.message_logs.appendleft("you craft with")
+                self.message_logs.appendleft(f"the {self.current_crafter.name}")
+                self.sounds_to_play.add(Sound.INDICATOR)
+            elif target_mob and target_mob.has_tag(MobTag.BED):
+                if self.night_time:
+                    self.night_time = False
+                    self.level_is_dark = False
+                    self.day_cycle_timer = self.world_time
+                    self.message_logs.appendleft("you sleep the")
+                    self.message_logs.appendleft("night away")
+                    self.sounds_to_play.add(Sound.INDICATOR)
+                    self.music_changed = True
+                else:
+                    self.message_logs.appendleft("you cannot rest")
+                    self.message_logs.appendleft("during the day")
+                    self.sounds_to_play.add(Sound.FAILURE)
+            elif target_mob and target_mob.id == MobID.BOOKCASE:
+                self.message_logs.appendleft("lovely bookcase")
+                self.message_logs.appendleft("for decoration")
+                self.sounds_to_play.add(Sound.INDICATOR)
+            elif target_tile and target_tile.id in (TileID.OPEN_WOOD_DOOR,
+                                                    TileID.CLOSED_WOOD_DOOR):
+                if target_mob:
+                    self.message_logs.appendleft("door is blocked")
+                    self.message_logs.appendleft(f"by {target_mob.name}")
+                    self.sounds_to_play.add(Sound.FAILURE)
+                else:
+                    if target_tile.id is TileID.CLOSED_WOOD_DOOR:
+                        set_array(target_pos,
+                                  self.current_layer.tile_array,
+                                  Tile(TileID.OPEN_WOOD_DOOR))
+                        self.message_logs.appendleft("you open the")
+                        self.message_logs.appendleft(f"{target_tile.name}")
+                    else:
+                        set_array(target_pos,
+                                  self.current_layer.tile_array,
+                                  Tile(TileID.CLOSED_WOOD_DOOR))
+                        self.message_logs.appendleft("you close the")
+                        self.message_logs.appendleft(f"{target_tile.name}")
+                    self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+                    self.do_calc_light_map = True
+                    self.sounds_to_play.add(Sound.USE_ITEM)
+            elif target_tile and target_tile.id in (TileID.CLOUD_DOOR_CLOSED,
+                                                    TileID.CLOUD_DOOR_OPEN):
+                if target_mob:
+                    self.message_logs.appendleft("door is blocked")
+                    self.message_logs.appendleft(f"by {target_mob.name}")
+                    self.sounds_to_play.add(Sound.FAILURE)
+                else:
+                    if target_tile.id is TileID.CLOUD_DOOR_CLOSED:
+                        set_array(target_pos,
+                                  self.current_layer.tile_array,
+                                  Tile(TileID.CLOUD_DOOR_OPEN))
+                        self.message_logs.appendleft("you open the")
+                        self.message_logs.appendleft(f"{target_tile.name}")
+                    else:
+                        set_array(target_pos,
+                                  self.current_layer.tile_array,
+                                  Tile(TileID.CLOUD_DOOR_CLOSED))
+                        self.message_logs.appendleft("you close the")
+                        self.message_logs.appendleft(f"{target_tile.name}")
+                    self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+                    self.do_calc_light_map = True
+                    self.sounds_to_play.add(Sound.USE_ITEM)
+            elif target_tile and target_tile.id in (TileID.OBSIDIAN_DOOR_CLOSED,
+                                                    TileID.OBSIDIAN_DOOR_OPEN):
+                if target_mob:
+                    self.message_logs.appendleft("door is blocked")
+                    self.message_logs.appendleft(f"by {target_mob.name}")
+                    self.sounds_to_play.add(Sound.FAILURE)
+                else:
+                    if target_tile.id is TileID.OBSIDIAN_DOOR_CLOSED:
+                        set_array(target_pos,
+                                  self.current_layer.tile_array,
+                                  Tile(TileID.OBSIDIAN_DOOR_OPEN))
+                        self.message_logs.appendleft("you open the")
+                        self.message_logs.appendleft(f"{target_tile.name}")
+                    else:
+                        set_array(target_pos,
+                                  self.current_layer.tile_array,
+                                  Tile(TileID.OBSIDIAN_DOOR_CLOSED))
+                        self.message_logs.appendleft("you close the")
+                        self.message_logs.appendleft(f"{target_tile.name}")
+                    self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+                    self.do_calc_light_map = True
+                    self.sounds_to_play.add(Sound.USE_ITEM)
+            else:
+                self.game_mode = GameMode.INVENTORY
+
+    def wait(self) -> bool:
+        took_turn = False
+        if self.game_mode is GameMode.MOVE:
+            current_tile = get_array(self.player_pos, self.current_layer.tile_array)
+            if current_tile.has_tag(TileTag.DOWN_STAIRS):
+                self.current_layer_index += 1
+                assert self.current_layer_index < 5
+                set_array(self.player_pos, self.current_layer.mob_array, None)
+                self.game_world.catch_up(self.current_layer_index, self.world_time, self.player_pos)
+                self.current_layer = self.game_world.get_layer(self.current_layer_index)
+                self.game_world.prebuild_layer(self.current_layer_index + 1)
+                self.current_layer.mob_array.daylight_time = self.daylight_time
+                set_array(self.player_pos, self.current_layer.mob_array, Mob(MobID.PLAYER))
+                self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+                self.do_calc_light_map = True
+                self.level_is_dark = self.night_time if self.current_layer_index < 2 else True
+                self.message_logs.appendleft("you go down the")
+                self.message_logs.appendleft("staircase")
+                self.sounds_to_play.add(Sound.INDICATOR)
+                self.music_changed = True
+            elif current_tile.has_tag(TileTag.UP_STAIRS):
+                self.current_layer_index -= 1
+                assert self.current_layer_index > -1
+                set_array(self.player_pos, self.current_layer.mob_array, None)
+                self.game_world.catch_up(self.current_layer_index, self.world_time, self.player_pos)
+                self.current_layer = self.game_world.get_layer(self.current_layer_index)
+                self.current_layer.mob_array.daylight_time = self.daylight_time
+                set_array(self.player_pos, self.current_layer.mob_array, Mob(MobID.PLAYER))
+                self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+                self.do_calc_light_map = True
+                self.level_is_dark = self.night_time if self.current_layer_index < 2 else True
+                self.message_logs.appendleft("you go up the")
+                self.message_logs.appendleft("staircase")
+                self.sounds_to_play.add(Sound.INDICATOR)
+                self.music_changed = True
+                if self.never_been_to_sky and self.current_layer_index == 0:
+                    self.never_been_to_sky = False
+                    spawn_point = (0, 0)
+                    area_x, area_y = self.game_world.active_area(self.player_pos)
+                    while spawn_point == (0, 0):
+                        x_range = (max(5, area_x.start), min(self.world_size.x - 6, area_x.stop - 1))
+                        y_range = (max(5, area_y.start), min(self.world_size.y - 6, area_y.stop - 1))
+                        try_spawn = Point(random.randint(*x_range), random.randint(*y_range))
+                        if distance_within(try_spawn, self.player_pos, 15.5):
+                            continue
+                        spawn_point = try_spawn
+                        wizard = Mob(MobID.AIR_WIZARD)
+                        wizard.state = 'attack'
+                        set_array(spawn_point, self.current_layer.mob_array, wizard)
+                        self.message_logs.appendleft("the air wizard")
+                        self.message_logs.appendleft("is here...")
+                        break
+            else:
+                took_turn = True
+        else:
+            self.cursor_index = 0  # reset cursor
+            self.sounds_to_play.add(Sound.INDICATOR)
+        return took_turn
+
+    def tick(self):
+        """Run the world's turn all at once."""
+        deque(self.tick_slices(), maxlen=0)
+        self.update()
+
+    def tick_slices(self):
+        """Run the world's turn, yielding between slices of the work.
+
+        The front end runs it tick_budget ms a frame so a big tick doesn't
+        freeze the window, and holds back input until it is done; call
+        update() once it is.
+        """
+        # Chunks that just came into the active area make up the ticks they missed,
+        # which can grow or spread tiles that give light or block sight.
+        if self.game_world.catch_up(self.current_layer_index, self.world_time, self.player_pos):
+            self.do_calc_light_map = True
+        self.world_time += 1
+        if not self.night_time:
+            self.daylight_time += 1
+            self.current_layer.mob_array.daylight_time = self.daylight_time
+        if self.world_time - self.day_cycle_timer >= self.day_cycle_length:
+            self.day_cycle_timer = self.world_time
+            self.night_time = not self.night_time
+            if self.current_layer_index == 1:
+                self.music_changed = True
+            self.level_is_dark = self.night_time if self.current_layer_index < 2 else True
+            if self.night_time and self.current_layer_index < 2:
+                self.message_logs.appendleft("darkness falls")
+                self.message_logs.appendleft("over the land")
+            elif self.current_layer_index < 2:
+                self.message_logs.appendleft("the darkness")
+                self.message_logs.appendleft("is dispelled")
+        elif self.day_cycle_length - (self.world_time - self.day_cycle_timer) == 20:
+            if self.night_time and self.current_layer_index < 2:
+                self.message_logs.appendleft("the sun shines")
+                self.message_logs.appendleft("ever brighter")
+            elif self.current_layer_index < 2:
+                self.message_logs.appendleft("the sun is")
+                self.message_logs.appendleft("almost gone")
+        elif self.day_cycle_length - (self.world_time - self.day_cycle_timer) == 100:
+            if self.night_time and self.current_layer_index < 2:
+                self.message_logs.appendleft("the horizon")
+                self.message_logs.appendleft("shines faintly")
+            elif self.current_layer_index < 2:
+                self.message_logs.appendleft("the sun is")
+                self.message_logs.appendleft("starting to set")
+        if self.wizard_mode:
+            print(f"Layer: {self.current_layer_index} Tick: {self.world_time} "
+                  f"Mobs: {self.count_hostiles(*self.game_world.active_area(self.player_pos))}/{self.game_world.mob_cap}")
+
+        # Decay potion effects.
+        for effect_id in tuple(self.current_effects.keys()):
+            self.current_effects[effect_id] -= 1
+            if self.current_effects[effect_id] <= 0:
+                del self.current_effects[effect_id]
+                self.message_logs.appendleft(f"effect {effect_names[effect_id]}")
+                self.message_logs.appendleft("has run out")
+
+        if PotionEffect.SPEED in self.current_effects.keys():
+            self.message_logs.appendleft("speed potion is")
+            self.message_logs.appendleft("not implemented")
+
+        if PotionEffect.REGEN_HEALTH in self.current_effects.keys():
+            self.player_health += 1
+            self.player_health = min(self.player_health, 10)
+            self.message_logs.appendleft("you regenerate")
+            self.message_logs.appendleft("health +1H")
+
+        not_in_liquid = not get_array(self.player_pos, self.current_layer.tile_array).has_tag(TileTag.LIQUID)
+        if self.regen_stam and (not_in_liquid or (PotionEffect.SWIM in self.current_effects.keys())):
+            self.player_stamina += 1
+            self.player_stamina = min(self.player_stamina, 10)
+        self.regen_stam = True
+        if PotionEffect.REGEN_STAMINA in self.current_effects.keys():
+            self.player_stamina += 1
+            self.player_stamina = min(self.player_stamina, 10)
+        # Check for darkness; it can still be daytime in caves.
+        # Big worlds only spawn and tick mobs in the chunks around the player.
+        area_x, area_y = self.game_world.active_area(self.player_pos)
+        if (self.level_is_dark or self.current_layer_index == 0) and random.random() < self.mob_spawn_chance and \
+                self.count_hostiles(area_x, area_y) < self.game_world.mob_cap:
+            # Spawn a mob.
+            for i in range(100):
+                # Attempt to place 100 times before giving up
+                sx, sy = random.choice(area_x), random.choice(area_y)
+                if self.light_map[sx][sy] or distance_within((sx, sy), self.player_pos, self.light_radius + 1):
+                    continue  # don't spawn if the tile is lit
+                if self.current_layer_index == 0 and self.player_sees((sx, sy)):
+                    continue  # if player can see the spawn point in cloud layer
+                try_tile = self.current_layer.tile_array[sx][sy]
+                try_mob = self.current_layer.mob_array[sx][sy]
+                if try_mob or try_tile.has_tag(TileTag.LIQUID):
+                    continue  # don't replace another mob or spawn in liquid
+                if try_tile.has_tag(TileTag.BLOCK_MOVE) and try_tile.id != TileID.AIR:
+                    continue  # don't spawn in walls unless it is air
+                if try_tile.id in (TileID.WEB, TileID.SKY_WEBS):
+                    if self.current_layer_index == 0:
+                        mob_id = MobID.CLOUD_SPIDER
+                    elif self.current_layer_index < 4:
+                        mob_id = MobID.SPIDER
+                    else:
+                        mob_id = MobID.HELL_SPIDER
+                elif try_tile.id == TileID.AIR:
+                    if self.air_wizard_defeated:
+                        mob_id = MobID.UFO
+                    else:
+                        mob_id = MobID.FAIRY
+                else:
+                    mob_id = random.choice(mob_spawn_per_layer[self.current_layer_index])
+                self.current_layer.mob_array[sx][sy] = Mob(mob_id)
+                break
+        # Tick the tiles and mobs, a slice at a time.
+        yield from self.world_tick(area_x, area_y)
+
+    def update(self):
+        """Settle the state after a step or tick: wizard refills, death, the view and the light map."""
+        # Wizard mode.
+        if self.wizard_mode:
+            self.player_stamina = 10
+            self.player_health = 10
+
+        # Check for player death.
+        if not self.player_is_dead and self.player_health <= 0:
+            self.player_is_dead = True
+            self.message_logs.appendleft("you have died")
+            self.message_logs.appendleft("press escape")
+
+        # The view the player is shown, and that player_sees answers from. It
+        # comes from the cache unless something that blocks sight changed.
+        self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+
+        # Calculate the light map before drawing if needed.
+        if self.do_calc_light_map or self.game_world.active_area(self.player_pos) != self.lit_area:
+            self.do_calc_light_map = False
+            self.lit_area = self.calc_lightmap()
+
+    def line_of_sight(self, start: PointType, end: PointType) -> bool:
+        return line_of_sight(self.current_layer.tile_array, start, end)
+
+    def player_sees(self, pos: PointType) -> bool:
+        """Return whether pos is in the player's view, the same one that is drawn.
+
+        Only cells out past MAX_VIEW_DIST fall back to line_of_sight.
+        """
+        if distance_within(pos, self.player_pos, MAX_VIEW_DIST + 0.5):
+            return self.fov_field[pos[0] - self.player_pos[0]][pos[1] - self.player_pos[1]]
+        return self.line_of_sight(self.player_pos, pos)
+
+    def calc_fov(self, start: Point, radius: int) -> list[list[bool]]:
+        tile_array = self.current_layer.tile_array
+        # The same view comes back from the cache while nothing that blocks sight changes.
+        return self.view_field(tile_array, start, radius, opacity_version(tile_array))
+
+    def calc_lightmap(self) -> tuple[range, range]:
+        tile_array = self.current_layer.tile_array
+        if self.lights is None or self.lights.tile_array is not tile_array:
+            self.lights = LightMap(tile_array, self.game_world.make_array(0))
+            self.light_map = self.lights.counts
+        # Big worlds are only lit around the player.
+        area_x, area_y = self.game_world.active_area(self.player_pos)
+        # Only the sources that changed are relit.
+        self.lights.update(light_sources(self.current_layer, area_x, area_y))
+        return area_x, area_y
+
+    def despawn_missed(self, mob: Mob, pos: tuple[int, int]) -> bool:
+        """Roll the daylight despawns mob missed since it was last simulated, and return whether it despawned."""
+        missed = self.current_layer.mob_array.missed_daylight(mob)
+        if not missed or self.current_layer_index >= 2 or mob.id is MobID.PLAYER or \
+                mob.has_tag(MobTag.NO_DESPAWN) or distance_within(pos, self.player_pos, self.light_radius + 1):
+            return False
+        if random.random() < 1 - (1 - MOB_DESPAWN_CHANCE) ** missed:
+            self.current_layer.mob_array[pos[0]][pos[1]] = None
+            return True
+        return False
+
+    def count_hostiles(self, area_x: range, area_y: range) -> int:
+        """Count the hostile mobs in the area, the ones held against mob_cap.
+
+        Big worlds only count the chunks around the player, the ones mob_cap is sized for.
+        """
+        return self.current_layer.mob_array.category_count(MobCategory.HOSTILE, area_x, area_y)
+
+    def reduce_stamina(self, amount: int) -> bool:
+        if self.player_stamina - amount < 0:
+            return False
+        else:
+            self.player_stamina -= amount
+            self.regen_stam = False
+            return True
+
+    def reduce_health(self, amount: int) -> int:
+        if PotionEffect.ARMOR3 in self.current_effects.keys():
+            amount -= 3
+            amount = max(0, amount)
+        elif PotionEffect.ARMOR2 in self.current_effects.keys():
+            amount -= 2
+            amount = max(0, amount)
+        elif PotionEffect.ARMOR in self.current_effects.keys():
+            amount -= 1
+            amount = max(0, amount)
+        self.player_health -= amount
+        self.player_health = max(0, self.player_health)
+        return amount
+
+    def move_player(self, direction: tuple[int, int]) -> Point:
+        swapped = False
+        try_pos = Point(self.player_pos.x + direction[0], self.player_pos.y + direction[1])
+        move_mob = get_array(try_pos, self.current_layer.mob_array)
+        if move_mob:
+            if move_mob.has_tag(MobTag.PUSHABLE):
+                try_space = Point(try_pos.x + direction[0], try_pos.y + direction[1])
+                # check for mob collisions, then tile collisions
+                try_mob = get_array(try_space, self.current_layer.mob_array)
+                # there is no mob or we are out of bounds
+                if not try_mob:
+                    try_tile = get_array(try_space, self.current_layer.tile_array)
+                    # If it isn't the void and doesn't block movement.
+                    if try_tile is not None and not try_tile.has_tag(TileTag.BLOCK_MOVE):
+                        self.message_logs.appendleft("you push the")
+                        self.message_logs.appendleft(f"{move_mob.name}")
+                        set_array(try_pos, self.current_layer.mob_array, None)
+                        if try_tile.has_tag(TileTag.LIQUID):
+                            self.message_logs.appendleft("it sinks into")
+                            self.message_logs.appendleft(f"the {try_tile.name}")
+                        else:
+                            set_array(try_space,
+                                      self.current_layer.mob_array, move_mob)
+                            if try_tile.has_tag(TileTag.CRUSH):
+                                set_array(try_space, self.current_layer.tile_array,
+                                          Tile(tile_replace[try_tile.id]))
+                                self.message_logs.appendleft("it crushes the")
+                                self.message_logs.appendleft(f"{try_tile.name}")
+                        if move_mob.light > 0:
+                            self.do_calc_light_map = True
+                    else:
+                        self.message_logs.appendleft("you bump into")
+                        self.message_logs.appendleft(f"the {move_mob.name}")
+                        self.sounds_to_play.add(Sound.FAILURE)
+                else:
+                    self.message_logs.appendleft("you bump into")
+                    self.message_logs.appendleft(f"the {move_mob.name}")
+                    self.sounds_to_play.add(Sound.FAILURE)
+            elif move_mob.has_tag(MobTag.SWAPPABLE):
+                swapped = True
+                try_tile = get_array(try_pos, self.current_layer.tile_array)
+                player_tile = get_array(self.player_pos, self.current_layer.tile_array)
+                set_array(try_pos, self.current_layer.mob_array, Mob(MobID.PLAYER))
+                self.message_logs.appendleft("you swap places")
+                self.message_logs.appendleft(f"with {move_mob.name}")
+                if try_tile.has_tag(TileTag.CRUSH):
+                    set_array(try_pos, self.current_layer.tile_array,
+                              Tile(tile_replace[try_tile.id]))
+                    self.message_logs.appendleft("you crush the")
+                    self.message_logs.appendleft(f"{try_tile.name}")
+                if player_tile.id != TileID.LAVA:
+                    set_array(self.player_pos, self.current_layer.mob_array, move_mob)
+                else:
+                    self.message_logs.appendleft(f"{move_mob.name} sinks")
+                    self.message_logs.appendleft("into the lava")
+                    set_array(self.player_pos, self.current_layer.mob_array, None)
+            else:
+                self.message_logs.appendleft("you bump into")
+                self.message_logs.appendleft(f"the {move_mob.name}")
+                self.sounds_to_play.add(Sound.FAILURE)
+            if not swapped:
+                return self.player_pos
+            else:
+                return try_pos
+        move_tile = get_array(try_pos, self.current_layer.tile_array)
+        if move_tile is None:
+            self.message_logs.appendleft("you stare into")
+            self.message_logs.appendleft("the abyss")
+            self.sounds_to_play.add(Sound.FAILURE)
+            return self.player_pos
+        if move_tile.id == TileID.AIR:
+            if PotionEffect.HOVER in self.current_effects.keys():
+                set_array(try_pos, self.current_layer.tile_array, Tile(TileID.CLOUD))
+                set_array(self.player_pos, self.current_layer.mob_array, None)
+                set_array(try_pos, self.current_layer.mob_array, Mob(MobID.PLAYER))
+                return try_pos
+            else:
+                self.message_logs.appendleft("you teeter on")
+                self.message_logs.appendleft("the clouds edge")
+                self.sounds_to_play.add(Sound.FAILURE)
+                return self.player_pos
+        if move_tile.id == TileID.LAVA and PotionEffect.LAVA_WALK in self.current_effects.keys():
+            set_array(try_pos, self.current_layer.tile_array, Tile(TileID.OBSIDIAN))
+            set_array(self.player_pos, self.current_layer.mob_array, None)
+            set_array(try_pos, self.current_layer.mob_array, Mob(MobID.PLAYER))
+            return try_pos
+        damage = tile_damage[move_tile.id]
+        drain = tile_drain[move_tile.id]
+        if move_tile.has_tag(TileTag.BLOCK_MOVE):
+            self.message_logs.appendleft("you bump into")
+            self.message_logs.appendleft(f"the {move_tile.name}")
+            if move_tile.has_tag(TileTag.DAMAGE):
+                self.message_logs.appendleft("it hurts you")
+                damage = self.reduce_health(damage)
+                self.message_logs.appendleft(f"for -{damage}H")
+                self.sounds_to_play.add(Sound.HURT)
+            if move_tile.has_tag(TileTag.DRAIN):
+                self.message_logs.appendleft("it drains your")
+                self.message_logs.appendleft(f"stamina -{drain}S")
+                self.player_stamina -= drain
+                self.player_stamina = max(0, self.player_stamina)
+                self.regen_stam = False
+            return self.player_pos
+        if move_tile.has_tag(TileTag.DAMAGE):
+            if move_tile.id == TileID.LAVA and PotionEffect.LAVA_PROOF in self.current_effects.keys():
+                pass
+            else:
+                self.message_logs.appendleft(f"the {move_tile.name}")
+                damage = self.reduce_health(damage)
+                self.message_logs.appendleft(f"hurts you -{damage}H")
+                self.sounds_to_play.add(Sound.HURT)
+        if move_tile.has_tag(TileTag.DRAIN):
+            self.message_logs.appendleft(f"the {move_tile.name}")
+            self.message_logs.appendleft(f"slows you -{drain}S")
+            self.player_stamina -= drain
+            self.player_stamina = max(0, self.player_stamina)
+            self.regen_stam = False
+        if move_tile.has_tag(TileTag.LIQUID) and PotionEffect.SWIM not in self.current_effects.keys():
+            self.player_stamina -= 1
+            if self.player_stamina <= 0:
+                self.player_health -= 1
+                self.player_health = max(0, self.player_health)
+                self.message_logs.appendleft("you are sinking")
+                self.message_logs.appendleft(f"in {move_tile.name} -1H")
+                self.sounds_to_play.add(Sound.HURT)
+            self.player_stamina = max(0, self.player_stamina)
+            self.regen_stam = False
+        if move_tile.has_tag(TileTag.CRUSH):
+            set_array(try_pos, self.current_layer.tile_array, Tile(tile_replace[move_tile.id]))
+            for item in resolve_loot(tile_break_loot[move_tile.id]):
+                add_to_inventory(item, self.inventory)
+            self.message_logs.appendleft("you crush the")
+            self.message_logs.appendleft(f"{move_tile.name}")
+        set_array(self.player_pos, self.current_layer.mob_array, None)
+        set_array(try_pos, self.current_layer.mob_array, Mob(MobID.PLAYER))
+        return try_pos
+
+    def world_tick(self, area_x: range, area_y: range):
+        """Tick the tiles and mobs in the area, yielding between slices of the work.
+
+        tick_slices passes the slices on, so the front end can spread a big
+        tick over several frames instead of freezing one.
+        """
+        currently_invisible = PotionEffect.INVISIBLE in self.current_effects.keys()
+        skelly_got_em = False
+        # Grow the tiles that are due this tick. Their grow times were
+        # drawn when they were placed, so nothing is rolled for them here.
+        for x, y in tick_growth(self.current_layer.tile_array, area_x, area_y):
+            current_tile = self.current_layer.tile_array[x][y]
+            tile = Tile(tile_grow[current_tile.id][0])
+            set_array((x, y),
+                      self.current_layer.tile_array, tile)
+            if current_tile.has_tag(TileTag.LIGHT) or tile.has_tag(TileTag.LIGHT) or\
+                    current_tile.has_tag(TileTag.BLOCK_SIGHT) ^ tile.has_tag(TileTag.BLOCK_SIGHT):
+                self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+                self.do_calc_light_map = True
+            if (self.light_map[x][y] or not self.level_is_dark) and self.player_sees((x, y)):
+                self.message_logs.appendleft(f"{current_tile.name}")
+                self.message_logs.appendleft(f"grow> {tile.name}")
+        yield
+        # Tick the tiles that spawn things. Only those are kept in the
+        # active set, so this doesn't walk the whole map.
+        for x, y in active_cells(self.current_layer.tile_array, area_x, area_y):
+            current_tile = self.current_layer.tile_array[x][y]
+            # Spawn skeletons from desert bones.
+            if current_tile.id is TileID.DESERT_BONES and self.night_time and random.random() < 0.1:
+                if distance_within(self.player_pos, (x, y), 5.5):
+                    if get_array((x, y), self.current_layer.mob_array) is None:
+                        set_array((x, y), self.current_layer.tile_array, Tile(TileID.SAND))
+                        set_array((x, y), self.current_layer.mob_array, Mob(MobID.WHITE_SKELETON))
+                        if self.light_map[x][y] and self.player_sees((x, y)):
+                            self.message_logs.appendleft("the bones rise")
+                            self.message_logs.appendleft("from the sand")
+            if current_tile.id is TileID.ASH_BONES and random.random() < 0.1:
+                if distance_within(self.player_pos, (x, y), 5.5):
+                    if get_array((x, y), self.current_layer.mob_array) is None:
+                        set_array((x, y), self.current_layer.tile_array, Tile(TileID.ASH))
+                        set_array((x, y), self.current_layer.mob_array, Mob(MobID.BLACK_SKELETON))
+                        if self.light_map[x][y] and self.player_sees((x, y)):
+                            self.message_logs.appendleft("the bones rise")
+                            self.message_logs.appendleft("from the ash")
+        yield
+        if CELLULAR_SPREAD:
+            # Spread the whole area in one array step and only visit the cells that changed.
+            for (x, y), tile_id in spread_cells(self.current_layer.tile_array, area_x, area_y):
+                current_tile = self.current_layer.tile_array[x][y]
+                tile = Tile(tile_id)
+                set_array((x, y), self.current_layer.tile_array, tile)
+                if (current_tile.tag_mask ^ tile.tag_mask) & BLOCK_SIGHT_MASK or \
+                        (current_tile.tag_mask | tile.tag_mask) & LIGHT_MASK:
+                    self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+                    self.do_calc_light_map = True
+        else:
+            # Spread the tiles on the spread frontier. Cells spread onto this
+            # tick join the frontier but aren't in this list, so they wait a tick.
+            for x, y in spread_frontier(self.current_layer.tile_array, area_x, area_y):
+                yield
+                current_tile = self.current_layer.tile_array[x][y]
+                if not current_tile.tag_mask & SPREAD_MASK:
+                    continue  # changed earlier this tick
+                spread_onto, spread_chance = tile_spread[current_tile.id]
+                will_it_spread = random.random() < spread_chance
+                for nx in (-1, 0, 1):
+                    for ny in (-1, 0, 1):
+                        if nx == ny == 0:
+                            continue  # this is the same tile
+                        if math.fabs(nx) == math.fabs(ny) == 1:
+                            continue  # this is a diagonal
+                        neighbor = get_array((x + nx, y + ny),
+                                             self.current_layer.tile_array)
+                        if neighbor is None:
+                            continue
+                        elif neighbor.id == spread_onto and will_it_spread:
+                            set_array((x + nx, y + ny),
+                                      self.current_layer.tile_array, Tile(current_tile.id))
+                            if (neighbor.has_tag(TileTag.BLOCK_SIGHT) ^
+                                    current_tile.has_tag(TileTag.BLOCK_SIGHT)) or \
+                                    neighbor.has_tag(TileTag.LIGHT) or current_tile.has_tag(TileTag.LIGHT):
+                                # if we are changing a vision blocker to clear or vice versa
+                                # if they are both clear or vision blockers we don't need to update
+                                self.fov_field = self.calc_fov(self.player_pos, MAX_VIEW_DIST)
+                                self.do_calc_light_map = True
+                        elif current_tile.id == TileID.WATER and neighbor.id == TileID.LAVA:
+                            set_array((x + nx, y + ny), self.current_layer.tile_array, Tile(TileID.OBSIDIAN))
+                        elif current_tile.id == TileID.LAVA and neighbor.id == TileID.WATER:
+                            set_array((x + nx, y + ny), self.current_layer.tile_array, Tile(TileID.OBSIDIAN))
+        # Mobs outside the bubble aren't simulated, but they still make up the daylight despawns
+        # they missed, a few buckets of the area a tick, so they don't pile up against the cap.
+        if self.current_layer_index < 2:
+            for current_mob, pos in self.current_layer.mob_array.sweep(area_x, area_y, DESPAWN_SWEEP_BUCKETS):
+                self.despawn_missed(current_mob, pos)
+        yield
+        # Then tick the mobs in the bubble around the player, and the ones that are always simulated.
+        # The list is taken only now, after the spawner and the rising bones, so the mobs they made
+        # get their first tick this tick, as they did when the whole grid was walked. Nothing in the
+        # mob phase makes new mobs, so no mob waits a tick for its first turn.
+        for current_mob, (x, y) in self.current_layer.mob_array.mobs_near(self.player_pos, MOB_SIM_DISTANCE):
+            yield
+            if current_mob.id == MobID.PLAYER or x not in area_x or y not in area_y:
+                continue
+            if self.current_layer.mob_array.positions.get(current_mob) != (x, y):
+                continue  # killed earlier this tick
+            if self.despawn_missed(current_mob, (x, y)):
+                continue
+            if not distance_within(self.player_pos, (x, y), MOB_SIM_DISTANCE) and not \
+                    current_mob.has_tag(MobTag.ALWAYS_SIM):
+                continue  # mobs outside this radius won't be ticked unless always active
+            if current_mob.has_tag(MobTag.EXPLODE):
+                sense_radius = INVIS_SENSE_DISTANCE if currently_invisible else DEVIL_EXPLODE_RADIUS
+                current_mob.fuse += 1
+                if current_mob.id == MobID.DEVIL:
+                    if not distance_within((x, y), self.player_pos, sense_radius):
+                        current_mob.fuse -= 1
+                        current_mob.fuse = max(0, current_mob.fuse)
+                    elif self.player_sees((x, y)):
+                        self.message_logs.appendleft(f"{current_mob.name} will")
+                        self.message_logs.appendleft(
+                            f"explode in {mob_explosion[current_mob.id][0] - current_mob.fuse}")
+                if current_mob.id in (MobID.BOMB, MobID.RED_BOMB, MobID.WHITE_BOMB):
+                    self.message_logs.appendleft(f"{current_mob.name} will")
+                    self.message_logs.appendleft(f"explode in {mob_explosion[current_mob.id][0] - current_mob.fuse}")
+                if current_mob.fuse >= mob_explosion[current_mob.id][0]:
+                    radius = mob_explosion[current_mob.id][1]
+                    self.sounds_to_play.add(Sound.EXPLOSION)
+                    self.message_logs.popleft()
+                    self.message_logs.popleft()
+                    self.message_logs.appendleft(f"the {current_mob.name}")
+                    self.message_logs.appendleft("has exploded")
+                    for nx in range(-radius, radius + 1):
+                        for ny in range(-radius, radius + 1):
+                            if distance_within((x + nx, y + ny), (x, y), radius + 0.5):
+                                tile_id = TileID.HOLE if self.current_layer_index > 0 else TileID.AIR
+                                tile = get_array((x + nx, y + ny), self.current_layer.tile_array)
+                                if tile and tile.id not in (TileID.DOWN_STAIRS, TileID.UP_STAIRS,
+                                    TileID.OBSIDIAN, TileID.OBSIDIAN_FLOOR, TileID.OBSIDIAN_BRICKS,
+                                    TileID.OBSIDIAN_DOOR_OPEN, TileID.OBSIDIAN_DOOR_CLOSED,
+                                                            ):
+                                    set_array((x + nx, y + ny), self.current_layer.tile_array, Tile(tile_id))
+                                mob = get_array((x + nx, y + ny), self.current_layer.mob_array)
+                                if mob and mob.id not in (MobID.AIR_WIZARD, MobID.PLAYER):
+                                    set_array((x + nx, y + ny), self.current_layer.mob_array, None)
+                                if mob and mob.id == MobID.PLAYER:
+                                    self.reduce_health(mob_explode_dmg[current_mob.id])
+                                    self.sounds_to_play.add(Sound.HURT)
+            if current_mob.has_tag(MobTag.AI_FOLLOW):
+                cur_tile = get_array((x, y), self.current_layer.tile_array)
+                if cur_tile and cur_tile.has_tag(TileTag.LIQUID) and not current_mob.has_tag(MobTag.SWAPPABLE):
+                    set_array((x, y), self.current_layer.mob_array, None)
+                    continue
+                current_mob.ai_tick += 1
+                if current_mob.ai_tick % current_mob.ai_timer != 0:
+                    continue  # only tick every ai_timer ticks
+                dist = DOG_FOLLOW_RADIUS if current_mob.has_tag(MobTag.SWAPPABLE) else CHASE_DISTANCE
+                dist = INVIS_SENSE_DISTANCE if currently_invisible else dist
+                if current_mob.id == MobID.SPRITE:
+                    dist = 20
+                if distance_within((x, y), self.player_pos, dist):
+                    # chase player
+                    dir_vec = towards((x, y), self.player_pos)
+                else:
+                    # wander randomly
+                    dir_vec = Point(random.random(), random.random())
+                if math.fabs(dir_vec.x) > math.fabs(dir_vec.y):
+                    # mob wants to move horizontally
+                    try_pos = Point(x + int(math.copysign(1, dir_vec.x)), y)
+                elif math.fabs(dir_vec.x) < math.fabs(dir_vec.y):
+                    # mob wants to move vertically
+                    try_pos = Point(x, y + int(math.copysign(1, dir_vec.y)))
+                else:
+                    # mob is diagonal
+                    if random.random() < 0.5:
+                        try_pos = Point(x + int(math.copysign(1, dir_vec.x)), y)
+                    else:
+                        try_pos = Point(x, y + int(math.copysign(1, dir_vec.y)))
+                move_mob = get_array(try_pos, self.current_layer.mob_array)
+                if move_mob and move_mob.id == MobID.PLAYER and current_mob.has_tag(MobTag.DAMAGE):
+                    dmg = self.reduce_health(mob_damage[current_mob.id])
+                    self.message_logs.appendleft(f"the {current_mob.name}")
+                    self.message_logs.appendleft(f"hits you -{dmg}H")
+                    self.sounds_to_play.add(Sound.HURT)
+                move_tile = get_array(try_pos, self.current_layer.tile_array)
+                if move_tile and not move_mob and ((not move_tile.has_tag(TileTag.BLOCK_MOVE)) or
+                                                   move_tile.id == TileID.AIR) and \
+                        not (move_tile.id == TileID.LAVA):
+                    if move_tile.id == TileID.WATER and not current_mob.has_tag(MobTag.SWAPPABLE):
+                        continue
+                    if move_tile.id == TileID.AIR and not (current_mob.id == MobID.SPRITE):
+                        continue
+                    set_array((x, y), self.current_layer.mob_array, None)
+                    set_array(try_pos, self.current_layer.mob_array, current_mob)
+                    if move_tile.has_tag(TileTag.CRUSH):
+                        set_array(try_pos, self.current_layer.tile_array,
+                                  Tile(tile_replace[move_tile.id]))
+            elif current_mob.has_tag(MobTag.AI_JUMP):
+                cur_tile = get_array((x, y), self.current_layer.tile_array)
+                if cur_tile and cur_tile.has_tag(TileTag.LIQUID):
+                    set_array((x, y), self.current_layer.mob_array, None)
+                    continue
+                sense_radius = INVIS_SENSE_DISTANCE if currently_invisible else JUMP_DISTANCE
+                current_mob.ai_tick += 1
+                if current_mob.ai_tick % current_mob.ai_timer != 0:
+                    continue  # only tick every ai_timer ticks
+                if distance_within((x, y), self.player_pos, sense_radius):
+                    # chase player
+                    dir_vec = towards((x, y), self.player_pos)
+                else:
+                    # wander randomly
+                    dir_vec = Point(random.random(), random.random())
+                try_pos = Point(x + int(math.copysign(1, dir_vec.x)),
+                                y + int(math.copysign(1, dir_vec.y)))
+                move_mob = get_array(try_pos, self.current_layer.mob_array)
+                if move_mob and move_mob.id == MobID.PLAYER and current_mob.has_tag(MobTag.DAMAGE):
+                    dmg = self.reduce_health(mob_damage[current_mob.id])
+                    self.message_logs.appendleft(f"the {current_mob.name}")
+                    self.message_logs.appendleft(f"hits you -{dmg}H")
+                    self.sounds_to_play.add(Sound.HURT)
+                move_tile = get_array(try_pos, self.current_layer.tile_array)
+                if move_tile and not move_mob and not move_tile.has_tag(TileTag.BLOCK_MOVE) and not\
+                        move_tile.has_tag(TileTag.LIQUID):
+                    set_array((x, y), self.current_layer.mob_array, None)
+                    set_array(try_pos, self.current_layer.mob_array, current_mob)
+                    if move_tile.has_tag(TileTag.CRUSH):
+                        set_array(try_pos, self.current_layer.tile_array,
+                                  Tile(tile_replace[move_tile.id]))
+            elif current_mob.has_tag(MobTag.AI_SHOOT):
+                cur_tile = get_array((x, y), self.current_layer.tile_array)
+                if cur_tile and cur_tile.has_tag(TileTag.LIQUID):
+                    set_array((x, y), self.current_layer.mob_array, None)
+                    continue
+                sense_radius = INVIS_SENSE_DISTANCE if currently_invisible else SKELETON_SIGHT_RADIUS
+                current_mob.ai_tick += 1
+                if current_mob.ai_tick % current_mob.ai_timer != 0:
+                    continue  # only tick every ai_timer ticks
+                target_spaces = [
+                    (self.player_pos.x, self.player_pos.y + SKELETON_SHOOT_RADIUS),
+                    (self.player_pos.x, self.player_pos.y - SKELETON_SHOOT_RADIUS),
+                    (self.player_pos.x + SKELETON_SHOOT_RADIUS, self.player_pos.y),
+                    (self.player_pos.x - SKELETON_SHOOT_RADIUS, self.player_pos.y),
+                ]
+                for target_space in target_spaces:
+                    if (x, y) == target_space and self.line_of_sight((x, y), self.player_pos):
+                        dmg = self.reduce_health(mob_damage[current_mob.id])
+                        self.message_logs.appendleft(f"the {current_mob.name}s")
+                        self.message_logs.appendleft(f"arrow hits -{dmg}H")
+                        self.sounds_to_play.add(Sound.HURT)
+                        skelly_got_em = True
+                        break
+                if skelly_got_em:
+                    skelly_got_em = False
+                    continue
+                if distance_within((x, y), self.player_pos, sense_radius):
+                    # go to nearest target space
+                    target_spaces.sort(key=lambda p: distance_squared(p, (x, y)))
+                    for target_space in target_spaces:
+                        move_tile = get_array(target_space, self.current_layer.tile_array)
+                        move_mob = get_array(target_space, self.current_layer.mob_array)
+                        if move_mob or move_tile is None or move_tile.has_tag(TileTag.BLOCK_MOVE):
+                            continue
+                        else:
+                            dir_vec = towards((x, y), target_space)
+                            break
+                    else:
+                        # no open target space, wander
+                        dir_vec = Point(random.random(), random.random())
+                else:
+                    # wander randomly
+                    dir_vec = Point(random.random(), random.random())
+                if math.fabs(dir_vec.x) > math.fabs(dir_vec.y):
+                    # mob wants to move horizontally
+                    try_pos = Point(x + int(math.copysign(1, dir_vec.x)), y)
+                elif math.fabs(dir_vec.x) < math.fabs(dir_vec.y):
+                    # mob wants to move vertically
+                    try_pos = Point(x, y + int(math.copysign(1, dir_vec.y)))
+                else:
+                    # mob is diagonal
+                    if random.random() < 0.5:
+                        try_pos = Point(x + int(math.copysign(1, dir_vec.x)), y)
+                    else:
+                        try_pos = Point(x, y + int(math.copysign(1, dir_vec.y)))
+                move_mob = get_array(try_pos, self.current_layer.mob_array)
+                move_tile = get_array(try_pos, self.current_layer.tile_array)
+                if move_tile and not move_mob and not move_tile.has_tag(TileTag.BLOCK_MOVE) and not\
+                        move_tile.has_tag(TileTag.LIQUID):
+                    set_array((x, y), self.current_layer.mob_array, None)
+                    set_array(try_pos, self.current_layer.mob_array, current_mob)
+                    if move_tile.has_tag(TileTag.CRUSH):
+                        set_array(try_pos, self.current_layer.tile_array,
+                                  Tile(tile_replace[move_tile.id]))
+            elif current_mob.has_tag(MobTag.AI_WANDER):
+                current_mob.ai_tick += 1
+                if current_mob.ai_tick % current_mob.ai_timer != 0:
+                    continue  # only tick every ai_timer ticks
+                # wander randomly
+                dir_vec = Point(random.random(), random.random())
+                # make dir_vec only cardinal directions
+                if math.fabs(dir_vec.x) > math.fabs(dir_vec.y):
+                    dir_vec = Point(int(math.copysign(1, dir_vec.x)), 0)
+                else:
+                    dir_vec = Point(0, int(math.copysign(1, dir_vec.y)))
+                # if it is moving in the opposite direction as last move
+                if dir_vec == (-current_mob.last_dir.x, -current_mob.last_dir.y):
+                    # go the direction of last time
+                    # if a mob is going right, it cannot go left without going up or down first
+                    dir_vec = Point(-dir_vec.x, -dir_vec.y)
+                current_mob.last_dir = dir_vec
+                if math.fabs(dir_vec.x) > math.fabs(dir_vec.y):
+                    # mob wants to move horizontally
+                    try_pos = Point(x + int(math.copysign(1, dir_vec.x)), y)
+                elif math.fabs(dir_vec.x) < math.fabs(dir_vec.y):
+                    # mob wants to move vertically
+                    try_pos = Point(x, y + int(math.copysign(1, dir_vec.y)))
+                else:
+                    # mob is diagonal
+                    if random.random() < 0.5:
+                        try_pos = Point(x + int(math.copysign(1, dir_vec.x)), y)
+                    else:
+                        try_pos = Point(x, y + int(math.copysign(1, dir_vec.y)))
+                move_mob = get_array(try_pos, self.current_layer.mob_array)
+                if move_mob and move_mob.id == MobID.PLAYER and current_mob.has_tag(MobTag.DAMAGE):
+                    dmg = self.reduce_health(mob_damage[current_mob.id])
+                    self.message_logs.appendleft(f"the {current_mob.name}")
+                    self.message_logs.appendleft(f"hits you -{dmg}H")
+                    self.sounds_to_play.add(Sound.HURT)
+                move_tile = get_array(try_pos, self.current_layer.tile_array)
+                if move_tile and not move_mob:
+                    if not move_tile.has_tag(TileTag.BLOCK_MOVE) or move_tile.id == TileID.AIR:
+                        set_array((x, y), self.current_layer.mob_array, None)
+                        set_array(try_pos, self.current_layer.mob_array, current_mob)
+                        if current_mob.light > 0:
+                            self.do_calc_light_map = True
+                        if move_tile.has_tag(TileTag.CRUSH):
+                            set_array(try_pos, self.current_layer.tile_array,
+                                      Tile(tile_replace[move_tile.id]))
+                    else:
+                        current_mob.last_dir = Point(-dir_vec.x, -dir_vec.y)
+            elif current_mob.has_tag(MobTag.AI_SPIDER):
+                cur_tile = get_array((x, y), self.current_layer.tile_array)
+                if cur_tile and cur_tile.has_tag(TileTag.LIQUID):
+                    set_array((x, y), self.current_layer.mob_array, None)
+                    continue
+                current_mob.ai_tick += 1
+                if current_mob.ai_tick % current_mob.ai_timer != 0:
+                    continue  # only tick every ai_timer ticks
+                player_tile = get_array(self.player_pos, self.current_layer.tile_array)
+                if player_tile.id not in (TileID.WEB, TileID.SKY_WEBS):
+                    continue  # don't do anything if player isn't on a web
+                if distance_within((x, y), self.player_pos, SPIDER_CHASE_RADIUS):
+                    # chase player
+                    dir_vec = towards((x, y), self.player_pos)
+                else:
+                    continue  # squat until player on web is close
+                if math.fabs(dir_vec.x) > math.fabs(dir_vec.y):
+                    # mob wants to move horizontally
+                    try_pos = Point(x + int(math.copysign(1, dir_vec.x)), y)
+                elif math.fabs(dir_vec.x) < math.fabs(dir_vec.y):
+                    # mob wants to move vertically
+                    try_pos = Point(x, y + int(math.copysign(1, dir_vec.y)))
+                else:
+                    # mob is diagonal
+                    if random.random() < 0.5:
+                        try_pos = Point(x + int(math.copysign(1, dir_vec.x)), y)
+                    else:
+                        try_pos = Point(x, y + int(math.copysign(1, dir_vec.y)))
+                move_mob = get_array(try_pos, self.current_layer.mob_array)
+                if move_mob and move_mob.id == MobID.PLAYER and current_mob.has_tag(MobTag.DAMAGE):
+                    dmg = self.reduce_health(mob_damage[current_mob.id])
+                    self.message_logs.appendleft(f"the {current_mob.name}")
+                    self.message_logs.appendleft(f"hits you -{dmg}H")
+                    self.sounds_to_play.add(Sound.HURT)
+                move_tile = get_array(try_pos, self.current_layer.tile_array)
+                if move_tile and not move_mob and not move_tile.has_tag(TileTag.BLOCK_MOVE) and not\
+                        move_tile.has_tag(TileTag.LIQUID):
+                    set_array((x, y), self.current_layer.mob_array, None)
+                    set_array(try_pos, self.current_layer.mob_array, current_mob)
+                    if move_tile.has_tag(TileTag.CRUSH):
+                        set_array(try_pos, self.current_layer.tile_array,
+                                  Tile(tile_replace[move_tile.id]))
+            elif current_mob.has_tag(MobTag.AI_FLEE):
+                sense_radius = INVIS_SENSE_DISTANCE if currently_invisible else SHADE_FLEE_RADIUS
+                current_mob.ai_tick += 1
+                if current_mob.ai_tick % current_mob.ai_timer != 0:
+                    continue  # only tick every ai_timer ticks
+                if distance_within((x, y), self.player_pos, sense_radius):
+                    # flee player
+                    dir_vec = towards(self.player_pos, (x, y))
+                    current_mob.state = 'flee'
+                else:
+                    # wander randomly
+                    dir_vec = Point(random.random(), random.random())
+                    current_mob.state = 'wander'
+                # make dir_vec only cardinal directions
+                if math.fabs(dir_vec.x) > math.fabs(dir_vec.y):
+                    dir_vec = Point(int(math.copysign(1, dir_vec.x)), 0)
+                else:
+                    dir_vec = Point(0, int(math.copysign(1, dir_vec.y)))
+                # if it is moving in the opposite direction as last move
+                if current_mob.state == 'wander' and \
+                        dir_vec == (-current_mob.last_dir.x, -current_mob.last_dir.y):
+                    # go the direction of last time
+                    # if a mob is going right, it cannot go left without going up or down first
+                    dir_vec = Point(-dir_vec.x, -dir_vec.y)
+                current_mob.last_dir = dir_vec
+                if math.fabs(dir_vec.x) > math.fabs(dir_vec.y):
+                    # mob wants to move horizontally
+                    try_pos = Point(x + int(math.copysign(1, dir_vec.x)), y)
+                elif math.fabs(dir_vec.x) < math.fabs(dir_vec.y):
+                    # mob wants to move vertically
+                    try_pos = Point(x, y + int(math.copysign(1, dir_vec.y)))
+                else:
+                    # mob is diagonal
+                    if random.random() < 0.5:
+                        try_pos = Point(x + int(math.copysign(1, dir_vec.x)), y)
+                    else:
+                        try_pos = Point(x, y + int(math.copysign(1, dir_vec.y)))
+                move_mob = get_array(try_pos, self.current_layer.mob_array)
+                move_tile = get_array(try_pos, self.current_layer.tile_array)
+                if move_tile and not move_mob:
+                    if not move_tile.has_tag(TileTag.BLOCK_MOVE):
+                        set_array((x, y), self.current_layer.mob_array, None)
+                        set_array(try_pos, self.current_layer.mob_array, current_mob)
+                        if current_mob.light > 0:
+                            self.do_calc_light_map = True
+                        if move_tile.has_tag(TileTag.CRUSH):
+                            set_array(try_pos, self.current_layer.tile_array,
+                                      Tile(tile_replace[move_tile.id]))
+                    else:
+                        current_mob.last_dir = Point(-dir_vec.x, -dir_vec.y)
+            elif current_mob.has_tag(MobTag.AI_AIR_WIZARD):
+                current_mob.ai_tick += 1
+                if current_mob.ai_tick % current_mob.ai_timer != 0:
+                    continue  # only tick every ai_timer ticks
+                if current_mob.ai_tick - current_mob.ai_state_timer >= current_mob.ai_state_freq:
+                    current_mob.ai_state_timer = current_mob.ai_tick
+                    if current_mob.state == "attack":
+                        current_mob.state = "flee"
+                    elif current_mob.state == "flee":
+                        current_mob.state = "spawn"
+                    else:
+                        current_mob.state = "attack"
+                if current_mob.state == "attack":
+                    dir_vec = towards((x, y), self.player_pos)
+                elif current_mob.state == "flee":
+                    dir_vec = towards(self.player_pos, (x, y))
+                else:
+                    dir_vec = Point(0, 0)
+                if dir_vec == (0, 0):
+                    sx, sy = random.randint(-1, 1), random.randint(-1, 1)
+                    try_pos = (x + sx, y + sy)
+                    move_mob = get_array(try_pos, self.current_layer.mob_array)
+                    move_tile = get_array(try_pos, self.current_layer.tile_array)
+                    if move_tile and not move_mob:
+                        set_array(try_pos, self.current_layer.mob_array, Mob(MobID.SPRITE))
+                        if move_tile.has_tag(TileTag.CRUSH):
+                            set_array(try_pos, self.current_layer.tile_array,
+                                      Tile(tile_replace[move_tile.id]))
+                else:
+                    if math.fabs(dir_vec.x) > math.fabs(dir_vec.y):
+                        # mob wants to move horizontally
+                        try_pos = Point(x + int(math.copysign(1, dir_vec.x)), y)
+                    elif math.fabs(dir_vec.x) < math.fabs(dir_vec.y):
+                        # mob wants to move vertically
+                        try_pos = Point(x, y + int(math.copysign(1, dir_vec.y)))
+                    else:
+                        # mob is diagonal
+                        if random.random() < 0.5:
+                            try_pos = Point(x + int(math.copysign(1, dir_vec.x)), y)
+                        else:
+                            try_pos = Point(x, y + int(math.copysign(1, dir_vec.y)))
+                    move_mob = get_array(try_pos, self.current_layer.mob_array)
+                    if move_mob and move_mob.id == MobID.PLAYER and current_mob.has_tag(MobTag.DAMAGE):
+                        dmg = self.reduce_health(mob_damage[current_mob.id])
+                        self.message_logs.appendleft(f"the {current_mob.name}")
+                        self.message_logs.appendleft(f"hits you -{dmg}H")
+                        self.sounds_to_play.add(Sound.HURT)
+                    move_tile = get_array(try_pos, self.current_layer.tile_array)
+                    if move_tile and not move_mob:
+                        set_array((x, y), self.current_layer.mob_array, None)
+                        set_array(try_pos, self.current_layer.mob_array, current_mob)
+                        if move_tile.has_tag(TileTag.CRUSH):
+                            set_array(try_pos, self.current_layer.tile_array,
+                                      Tile(tile_replace[move_tile.id]))
@@ -1,6 +1,6 @@
 from collections import namedtuple, defaultdict
 
-from data import Color, Graphic, TileID, TileTag
+from data import Color, Graphic, TileID, TileTag, tag_mask_table
 
 
 tile_replace: dict[TileID, TileID] = {
@@ -201,14 +201,37 @@ tile_data = {
 
 
 class Tile:
-    def __init__(self, tileid: TileID):
-        self.id = tileid
-        self.tile_data = tile_data[self.id]
-        self.name = self.tile_data.name
-        self.graphic = self.tile_data.graphic
-        self.max_health = self.tile_data.max_health
-        self.health = self.max_health
-        self.tags = self.tile_data.tags
+    """A tile of some TileID.
+
+    Tile(tileid) returns the one shared instance for that id, so tiles are
+    read only. A tile that has lost health is a private copy made by damaged().
+    """
+    __slots__ = ("id", "tile_data", "name", "graphic", "max_health", "health", "tags", "tag_mask")
+
+    def __new__(cls, tileid: TileID, health: int | None = None):
+        if health is None and tileid in shared_tiles:
+            return shared_tiles[tileid]
+        tile = super().__new__(cls)
+        data = tile_data[tileid]
+        for name, value in (("id", tileid), ("tile_data", data), ("name", data.name), ("graphic", data.graphic),
+                            ("max_health", data.max_health), ("tags", data.tags),
+                            ("tag_mask", tile_tag_masks[tileid.value]),
+                            ("health", data.max_health if health is None else health)):
+            object.__setattr__(tile, name, value)
+        if health is None:
+            shared_tiles[tileid] = tile
+        return tile
+
+    def __setattr__(self, name: str, value):
+        raise AttributeError("tiles are shared between cells, use damaged() to change health")
+
+    def damaged(self, amount: int) -> "Tile":
+        """Return a private copy of this tile with amount less health."""
+        return Tile(self.id, self.health - amount)
 
     def has_tag(self, tag: TileTag) -> bool:
-        return tag in self.tags
+        return self.tag_mask & tag.mask != 0
+
+
+tile_tag_masks = tag_mask_table(tile_data)
+shared_tiles: dict[TileID, Tile] = {}
@@ -1,17 +1,62 @@
+import heapq
+import itertools
+import math
+import os
 import random
-from collections import namedtuple
-from typing import Callable
+import sys
+import threading
+import time
+from collections import namedtuple, Counter
+from pathlib import Path
+from typing import Callable, Iterator
 
+import numpy as np
 import opensimplex
 
-from tiles import Tile, TileID
-from data import PointType
+from noise import noise_permutation, noise_grid
+from tiles import Tile, TileID, tile_grow, tile_spread, tile_light
+from mobs import Mob, mob_category
+from data import PointType, TileTag, MobID, MobTag, MobCategory
 
 
 Layer = namedtuple("Layer", ("tile_array", "mob_array", "mem_array"))
+# Something that lights the cells around it. kind is the TileID or MobID giving the light.
+LightSource = namedtuple("LightSource", ("pos", "radius", "kind"))
 
 STAIR_BORDER_PAD = 5
 STAIR_STAIR_PAD = 10
+# Worlds bigger than this on either side are stored and generated in chunks.
+MAX_FLAT_WORLD_SIZE = 256
+CHUNK_SIZE = 32
+# Stairs stay this far from chunk edges so their surroundings fit in the chunk
+# and stairs in neighbouring chunks are always more than STAIR_STAIR_PAD apart.
+CHUNK_STAIR_PAD = STAIR_STAIR_PAD // 2 + 1
+# How many chunks around the player are ticked, lit and spawned in.
+ACTIVE_CHUNK_RADIUS = 2
+# Catching up a chunk that comes back into the active area spreads for at most
+# this many steps, and everything stops once it has taken CATCH_UP_BUDGET seconds.
+CATCH_UP_SPREAD_STEPS = 64
+CATCH_UP_BUDGET = 0.025
+# Mobs are filed in squares this big for finding the ones near the player.
+MOB_BUCKET_SIZE = 16
+ALWAYS_SIM_MASK = MobTag.ALWAYS_SIM.mask
+# Layers of worlds made with cache_layers are cached on disk, in the user's
+# cache directory. Bump the version whenever generation changes so stale
+# layers are never loaded.
+WORLDGEN_VERSION = 1
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def user_cache_dir() -> Path:
+    """Return the directory this platform keeps the user's caches in."""
+    if sys.platform == "win32":
+        return Path(os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local")
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Caches"
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+
+
+CACHE_DIR = user_cache_dir() / "7drl_2024" / "worldgen"
 
 
 def distance_within(a: PointType, b: PointType, dist: int | float) -> bool:
@@ -53,37 +98,901 @@ def set_array(pos: PointType, array: list[list], value) -> bool:
         return False
 
 
+def get_tile_id(pos: PointType, array: "list[list] | TileGrid | ChunkedArray") -> TileID | None:
+    """Return the TileID at pos in a tile array, or None if out of bounds."""
+    if isinstance(array, TileGrid):
+        if pos[0] < 0 or pos[1] < 0:
+            return
+        try:
+            return value_to_tileid[array.ids[int(pos[0])][int(pos[1])]]
+        except IndexError:
+            return
+    tile = get_array(pos, array)
+    if tile is not None:
+        return tile.id
+
+
+def damage_tile(pos: PointType, array: "list[list] | TileGrid | ChunkedArray", amount: int) -> Tile | None:
+    """Take amount off the health of the tile at pos and return it, or None if out of bounds."""
+    tile = get_array(pos, array)
+    if tile is not None:
+        tile = tile.damaged(amount)
+        set_array(pos, array, tile)
+    return tile
+
+
+def ticks_until(chance: float) -> int:
+    """Draw how many ticks pass until something with this chance per tick happens."""
+    if chance >= 1:
+        return 1
+    # Geometric distribution, so the tick it happens on is the same as rolling every tick.
+    return int(math.log(1 - random.random()) / math.log(1 - chance)) + 1
+
+
+def tile_grids(tile_array: "TileGrid | ChunkedArray", area_x: range, area_y: range,
+               create: bool = True) -> list["TileGrid"]:
+    """Return the tile grids covering the area: the whole layer, or the chunks the area touches.
+
+    Chunks that haven't been made yet are generated, or left out if not create.
+    """
+    if isinstance(tile_array, TileGrid):
+        return [tile_array]
+    chunk_positions = [(chunk_x, chunk_y)
+                       for chunk_x in range(area_x.start // CHUNK_SIZE, (area_x.stop - 1) // CHUNK_SIZE + 1)
+                       for chunk_y in range(area_y.start // CHUNK_SIZE, (area_y.stop - 1) // CHUNK_SIZE + 1)]
+    if not create:
+        return [tile_array.chunks[chunk_pos] for chunk_pos in chunk_positions if chunk_pos in tile_array.chunks]
+    return [tile_array.get_chunk(chunk_pos, True) for chunk_pos in chunk_positions]
+
+
+def opacity_version(tile_array: "TileGrid | ChunkedArray") -> int:
+    """Return a number that changes whenever a tile that blocks sight is placed or removed on the layer."""
+    return tile_array.opacity_version
+
+
+def take_sight_changes(tile_array: "TileGrid | ChunkedArray") -> set[tuple[int, int]]:
+    """Return the cells that started or stopped blocking sight since the last call, and forget them."""
+    grids = [tile_array] if isinstance(tile_array, TileGrid) else tile_array.chunks.values()
+    changes = set()
+    for grid in grids:
+        changes |= grid.sight_changes
+        grid.sight_changes.clear()
+    return changes
+
+
+def tick_growth(tile_array: "TileGrid | ChunkedArray", area_x: range, area_y: range) -> list[tuple[int, int]]:
+    """Advance the tiles in the area by one tick and return the positions due to grow."""
+    cells = []
+    for grid in tile_grids(tile_array, area_x, area_y):
+        cells.extend(grid.tick_growth())
+    return cells
+
+
+def spread_frontier(tile_array: "TileGrid | ChunkedArray", area_x: range, area_y: range) -> list[tuple[int, int]]:
+    """Return the positions in the area whose tiles could spread this tick."""
+    return [cell for grid in tile_grids(tile_array, area_x, area_y)
+            for cell in grid.frontier if cell[0] in area_x and cell[1] in area_y]
+
+
+def active_cells(tile_array: "TileGrid | ChunkedArray", area_x: range, area_y: range) -> list[tuple[int, int]]:
+    """Return the positions in the area whose tiles the world tick has to visit."""
+    return [cell for grid in tile_grids(tile_array, area_x, area_y)
+            for cell in grid.active if cell[0] in area_x and cell[1] in area_y]
+
+
+def light_sources(layer: Layer, area_x: range, area_y: range) -> list[LightSource]:
+    """Return the light giving tiles and mobs in the area of a layer.
+
+    Both are kept track of as they are set, so this doesn't look at the
+    rest of the cells.
+    """
+    tile_array = layer.tile_array
+    sources = []
+    for grid in tile_grids(tile_array, area_x, area_y):
+        for x, y in grid.lights:
+            if x in area_x and y in area_y:
+                value = grid.ids[x - grid.origin[0]][y - grid.origin[1]]
+                sources.append(LightSource((x, y), light_by_value[value], value_to_tileid[value]))
+    for mob in layer.mob_array.lights:
+        pos = layer.mob_array.positions[mob]
+        if pos[0] in area_x and pos[1] in area_y:
+            sources.append(LightSource(pos, mob.light, mob.id))
+    return sources
+
+
+def next_to(mask: np.ndarray) -> np.ndarray:
+    """Return which cells of a 2D bool array have a cardinal neighbour that is set."""
+    padded = np.pad(mask, 1)
+    return padded[:-2, 1:-1] | padded[2:, 1:-1] | padded[1:-1, :-2] | padded[1:-1, 2:]
+
+
+def area_ids(tile_array: "TileGrid | ChunkedArray", area_x: range, area_y: range) -> np.ndarray:
+    """Return the tile id values of the area and a one cell border around it.
+
+    Indexed [x, y] from (area_x.start - 1, area_y.start - 1). Cells off the
+    map or in chunks that haven't been made are 0.
+    """
+    left, top = area_x.start - 1, area_y.start - 1
+    ids = np.zeros((len(area_x) + 2, len(area_y) + 2), dtype=np.uint8)
+    if isinstance(tile_array, TileGrid):
+        grids = [tile_array]
+    else:
+        # Only chunks that already exist, so the border doesn't generate new ones.
+        grids = [tile_array.chunks[(chunk_x, chunk_y)]
+                 for chunk_x in range(left // CHUNK_SIZE, (left + ids.shape[0] - 1) // CHUNK_SIZE + 1)
+                 for chunk_y in range(top // CHUNK_SIZE, (top + ids.shape[1] - 1) // CHUNK_SIZE + 1)
+                 if (chunk_x, chunk_y) in tile_array.chunks]
+    for grid in grids:
+        x0, y0 = max(left, grid.origin[0]), max(top, grid.origin[1])
+        x1 = min(left + ids.shape[0], grid.origin[0] + grid.size[0])
+        y1 = min(top + ids.shape[1], grid.origin[1] + grid.size[1])
+        if x0 < x1 and y0 < y1:
+            ids[x0 - left:x1 - left, y0 - top:y1 - top] = grid.to_grid()[
+                x0 - grid.origin[0]:x1 - grid.origin[0], y0 - grid.origin[1]:y1 - grid.origin[1]]
+    return ids
+
+
+def spread_step(ids: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Return the tile id values after one spread tick, worked out for the whole grid at once.
+
+    Only cells inside the one cell border of ids spread, but they can spread
+    onto and react with the border. Every spreader rolls its chance once and
+    if it spreads, it takes all the neighbours it can spread onto. Lava
+    touching water, and holes taken by both water and lava, turn to obsidian.
+    """
+    inside = np.zeros(ids.shape, dtype=bool)
+    inside[1:-1, 1:-1] = True
+    new_ids = ids.copy()
+    taken = {}
+    for spreader, (spread_onto, chance) in tile_spread.items():
+        spreading = (ids == spreader.value) & inside
+        if chance < 1:
+            spreading[spreading] = rng.random(np.count_nonzero(spreading)) < chance
+        taken[spreader] = next_to(spreading) & (ids == spread_onto.value)
+        new_ids[taken[spreader]] = spreader.value
+    water = ids == TileID.WATER.value
+    lava = ids == TileID.LAVA.value
+    obsidian = taken[TileID.WATER] & taken[TileID.LAVA]
+    obsidian |= lava & (next_to(water & inside) | (inside & next_to(water)))
+    new_ids[obsidian] = TileID.OBSIDIAN.value
+    return new_ids
+
+
+def spread_cells(tile_array: "TileGrid | ChunkedArray", area_x: range, area_y: range,
+                 rng: np.random.Generator | None = None, steps: int = 1,
+                 deadline: float | None = None) -> list[tuple[tuple[int, int], TileID]]:
+    """Run spread ticks over the area with spread_step and return the cells that change, and what to.
+
+    Stops before the steps are done if time.perf_counter() passes deadline.
+    """
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+    ids = area_ids(tile_array, area_x, area_y)
+    new_ids = ids
+    for _ in range(steps):
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        new_ids = spread_step(new_ids, rng)
+    left, top = area_x.start - 1, area_y.start - 1
+    return [((x + left, y + top), value_to_tileid[new_ids[x, y]])
+            for x, y in np.argwhere(new_ids != ids).tolist()]
+
+
+def array_values(array: "list[list] | ChunkedArray | MobGrid") -> Iterator:
+    """Iterate over everything stored in a 2D array, skipping chunks that were never made."""
+    if isinstance(array, MobGrid):
+        return iter(array.positions)
+    if isinstance(array, ChunkedArray):
+        return array.values()
+    return itertools.chain.from_iterable(array)
+
+
+class ChunkedArray:
+    """2D array stored as CHUNK_SIZE square chunks, each made the first time it is needed.
+
+    Indexed like a list of lists, array[x][y], so get_array and set_array work
+    on it unchanged. Chunks come from generate_chunk(chunk_pos) if it is given,
+    otherwise they are filled with default and only made when written to.
+    """
+    def __init__(self, size: tuple[int, int], default=None,
+                 generate_chunk: Callable[[tuple[int, int]], list[list]] | None = None):
+        self.size = size
+        self.default = default
+        self.generate_chunk = generate_chunk
+        self.chunks: dict[tuple[int, int], list[list]] = {}
+        # For tile layers, the total of the chunks' opacity versions, which they keep up to date.
+        self.opacity_version = 0
+
+    def __len__(self) -> int:
+        return self.size[0]
+
+    def __getitem__(self, x: int) -> "ChunkColumn":
+        if not 0 <= x < self.size[0]:
+            raise IndexError("chunked array index out of range")
+        return ChunkColumn(self, x)
+
+    def get_chunk(self, chunk_pos: tuple[int, int], create: bool) -> list[list] | None:
+        chunk = self.chunks.get(chunk_pos)
+        if chunk is None:
+            if self.generate_chunk is not None:
+                chunk = self.generate_chunk(chunk_pos)
+            elif create:
+                chunk = make_2d_array((CHUNK_SIZE, CHUNK_SIZE), self.default)
+            else:
+                return None
+            self.chunks[chunk_pos] = chunk
+        return chunk
+
+    def get(self, x: int, y: int):
+        chunk = self.get_chunk((x // CHUNK_SIZE, y // CHUNK_SIZE), False)
+        if chunk is None:
+            return self.default
+        return chunk[x % CHUNK_SIZE][y % CHUNK_SIZE]
+
+    def set(self, x: int, y: int, value):
+        self.get_chunk((x // CHUNK_SIZE, y // CHUNK_SIZE), True)[x % CHUNK_SIZE][y % CHUNK_SIZE] = value
+
+    def values(self) -> Iterator:
+        for chunk in self.chunks.values():
+            for column in chunk:
+                yield from column
+
+
+class ChunkColumn:
+    """One x column of a ChunkedArray."""
+    __slots__ = ("array", "x")
+
+    def __init__(self, array: ChunkedArray, x: int):
+        self.array = array
+        self.x = x
+
+    def __getitem__(self, y: int):
+        if not 0 <= y < self.array.size[1]:
+            raise IndexError("chunked array index out of range")
+        return self.array.get(self.x, y)
+
+    def __setitem__(self, y: int, value):
+        if not 0 <= y < self.array.size[1]:
+            raise IndexError("chunked array index out of range")
+        self.array.set(self.x, y, value)
+
+
+def cache_path(world_seed: int, size: tuple[int, int], index: int, part: str) -> Path:
+    return CACHE_DIR / f"{world_seed}-{size[0]}x{size[1]}-v{WORLDGEN_VERSION}-{index}-{part}.npy"
+
+
+def load_cached_layer(world_seed: int, size: tuple[int, int], index: int) -> tuple[np.ndarray, list] | None:
+    """Return the cached grid and down stairs of a layer, or None if it isn't cached."""
+    grid_path = cache_path(world_seed, size, index, "grid")
+    stairs_path = cache_path(world_seed, size, index, "stairs")
+    try:
+        world_map = np.load(grid_path)
+        down_stairs = [tuple(point) for point in np.load(stairs_path).tolist()]
+        # Mark the layer as recently used so it is evicted last.
+        os.utime(grid_path)
+        os.utime(stairs_path)
+    except (OSError, ValueError):
+        return None
+    if world_map.shape != size:
+        return None
+    return world_map, down_stairs
+
+
+def save_cached_layer(world_seed: int, size: tuple[int, int], index: int, world_map: np.ndarray, down_stairs: list):
+    """Write a layer to the cache, then trim the cache back under MAX_CACHE_BYTES."""
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        for part, array in (("grid", world_map), ("stairs", np.array(down_stairs, dtype=np.int32).reshape(-1, 2))):
+            path = cache_path(world_seed, size, index, part)
+            # Write to a temporary file first so a half written layer is never loaded.
+            temp_path = path.with_name(f"{path.stem}-{os.getpid()}-{threading.get_ident()}.tmp")
+            with open(temp_path, "wb") as file:
+                np.save(file, array)
+            os.replace(temp_path, path)
+        evict_cache()
+    except OSError:
+        pass  # the cache is only a speedup
+
+
+def evict_cache():
+    """Delete the least recently used cache files until the cache fits in MAX_CACHE_BYTES."""
+    files = [(path.stat(), path) for path in CACHE_DIR.glob("*.npy")]
+    total = sum(stat.st_size for stat, _ in files)
+    for stat, path in sorted(files, key=lambda file: file[0].st_mtime):
+        if total <= MAX_CACHE_BYTES:
+            break
+        path.unlink(missing_ok=True)
+        total -= stat.st_size
+
+
+class TileGrid:
+    """Tile array stored as one byte of TileID value per cell.
+
+    Indexed like a list of lists of tiles, grid[x][y], which builds a Tile
+    for the cell. Only the cells that have taken damage keep anything more
+    than their id, in the damage dict.
+
+    The grid also keeps the world positions of its active tiles, the ones the
+    world tick has to visit, up to date as tiles are set. origin is the world
+    position of cell (0, 0), for grids that are chunks of a bigger layer.
+
+    Growing tiles aren't visited at all. When one is set, the tick it will
+    grow on is drawn up front and pushed onto the growth heap, counted in
+    ticks of this grid so growth only happens while the grid is simulated.
+
+    Spreading tiles are only visited while they are on the spread frontier,
+    next to something they can spread onto or react with. find_grid(x, y)
+    returns the grid holding a world position outside this one, so the
+    frontier can follow neighbours across chunk edges. A chunk also bumps
+    the opacity_version of its layer, so the layer's is never summed up.
+    """
+    def __init__(self, world_map: np.ndarray, origin: PointType = (0, 0),
+                 find_grid: "Callable[[int, int], TileGrid | None] | None" = None,
+                 layer: "ChunkedArray | None" = None):
+        self.size = world_map.shape
+        self.origin = origin
+        self.find_grid = find_grid
+        self.layer = layer
+        self.ids = [bytearray(column.tobytes()) for column in world_map.astype(np.uint8)]
+        # How much health each damaged cell has lost.
+        self.damage: dict[tuple[int, int], int] = {}
+        self.active: set[tuple[int, int]] = {
+            (x + origin[0], y + origin[1])
+            for x, y in np.argwhere(np.isin(world_map, [tile_id.value for tile_id in active_tile_ids])).tolist()}
+        # World positions of the tiles that give light.
+        self.lights: set[tuple[int, int]] = {
+            (x + origin[0], y + origin[1])
+            for x, y in np.argwhere(np.isin(world_map, [tile_id.value for tile_id in tile_light])).tolist()}
+        # How many times this grid has been ticked.
+        self.ticks = 0
+        # The world time less ticks, which stays the same while the grid is
+        # simulated every tick. None until the world first catches it up.
+        self.time_offset: int | None = None
+        # Goes up each time a cell starts or stops blocking sight, so views can be reused until it does.
+        self.opacity_version = 0
+        # World positions of those cells, until the light map takes them.
+        self.sight_changes: set[tuple[int, int]] = set()
+        # (tick, pos) of every scheduled growth, and the tick each growing cell is due on.
+        self.growth: list[tuple[int, tuple[int, int]]] = []
+        self.grow_due: dict[tuple[int, int], int] = {}
+        for x, y in np.argwhere(np.isin(world_map, [tile_id.value for tile_id in tile_grow])).tolist():
+            self.schedule_growth((x + origin[0], y + origin[1]), grow_chance_by_value[world_map[x, y]])
+        # Spreading cells with a neighbour inside this grid they can spread onto.
+        frontier = np.zeros(self.size, dtype=bool)
+        for spreader, targets in spread_targets.items():
+            is_target = np.isin(world_map, [target.value for target in targets])
+            frontier |= (world_map == spreader.value) & next_to(is_target)
+        self.frontier: set[tuple[int, int]] = {(x + origin[0], y + origin[1])
+                                               for x, y in np.argwhere(frontier).tolist()}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, x: int) -> "TileGridColumn":
+        return TileGridColumn(self, x, self.ids[x])
+
+    def to_grid(self) -> np.ndarray:
+        return np.frombuffer(b"".join(self.ids), dtype=np.uint8).reshape(self.size)
+
+    def schedule_growth(self, pos: tuple[int, int], chance: float):
+        due = self.ticks + ticks_until(chance)
+        self.grow_due[pos] = due
+        heapq.heappush(self.growth, (due, pos))
+
+    def grid_at(self, x: int, y: int) -> "TileGrid | None":
+        """Return the grid holding world position (x, y), if it exists."""
+        if 0 <= x - self.origin[0] < self.size[0] and 0 <= y - self.origin[1] < self.size[1]:
+            return self
+        if self.find_grid is not None:
+            return self.find_grid(x, y)
+
+    def value_at(self, x: int, y: int) -> int:
+        """Return the TileID value at world position (x, y), or 0 if there is nothing there."""
+        grid = self.grid_at(x, y)
+        if grid is None:
+            return 0
+        return grid.ids[x - grid.origin[0]][y - grid.origin[1]]
+
+    def update_frontier(self, x: int, y: int):
+        """Recheck whether world position (x, y) is on the spread frontier of its grid."""
+        grid = self.grid_at(x, y)
+        if grid is None:
+            return
+        targets = spread_target_values[grid.ids[x - grid.origin[0]][y - grid.origin[1]]]
+        if targets and any(self.value_at(x + dx, y + dy) in targets for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1))):
+            grid.frontier.add((x, y))
+        else:
+            grid.frontier.discard((x, y))
+
+    def refresh_edges(self):
+        """Recheck the frontier along this grid's edges, once the grids around it may have changed."""
+        left, top = self.origin
+        right, bottom = left + self.size[0] - 1, top + self.size[1] - 1
+        cells = set()
+        for x in range(left, right + 1):
+            cells.update(((x, top - 1), (x, top), (x, bottom), (x, bottom + 1)))
+        for y in range(top, bottom + 1):
+            cells.update(((left - 1, y), (left, y), (right, y), (right + 1, y)))
+        for cell in cells:
+            self.update_frontier(*cell)
+
+    def tick_growth(self) -> list[tuple[int, int]]:
+        """Advance this grid by one tick and return the cells due to grow on it."""
+        self.ticks += 1
+        due_cells = []
+        while self.growth and self.growth[0][0] <= self.ticks:
+            due, pos = heapq.heappop(self.growth)
+            # Skip growth scheduled for a tile that has since been replaced.
+            if self.grow_due.get(pos) == due:
+                del self.grow_due[pos]
+                due_cells.append(pos)
+        return due_cells
+
+    def fast_forward(self, ticks: int, deadline: float) -> bool:
+        """Advance this grid by ticks at once, growing everything that comes due on the way.
+
+        Growth is done in the order it comes due, so a tile that grows into
+        another growing tile draws its next grow time from when it grew.
+        Past deadline the rest is left due, for the next tick to grow.
+        Returns whether anything grew.
+        """
+        target = self.ticks + ticks
+        grew = False
+        while self.growth and self.growth[0][0] <= target and time.perf_counter() < deadline:
+            due, pos = heapq.heappop(self.growth)
+            if self.grow_due.get(pos) != due:
+                continue
+            del self.grow_due[pos]
+            self.ticks = due
+            x, y = pos[0] - self.origin[0], pos[1] - self.origin[1]
+            self[x][y] = Tile(tile_grow[value_to_tileid[self.ids[x][y]]][0])
+            grew = True
+        self.ticks = target
+        return grew
+
+
+class TileGridColumn:
+    """One x column of a TileGrid."""
+    __slots__ = ("grid", "x", "ids")
+
+    def __init__(self, grid: TileGrid, x: int, ids: bytearray):
+        self.grid = grid
+        self.x = x
+        self.ids = ids
+
+    def __getitem__(self, y: int) -> Tile:
+        tile = tile_by_value[self.ids[y]]
+        damage = self.grid.damage
+        if damage and (self.x, y) in damage:
+            return tile.damaged(damage[(self.x, y)])
+        return tile
+
+    def __setitem__(self, y: int, tile: Tile):
+        value = tile.id.value
+        old_value = self.ids[y]
+        if is_active_value[old_value] or is_active_value[value]:
+            pos = (self.grid.origin[0] + self.x, self.grid.origin[1] + y)
+            if is_active_value[value]:
+                self.grid.active.add(pos)
+            else:
+                self.grid.active.discard(pos)
+        if light_by_value[old_value] or light_by_value[value]:
+            pos = (self.grid.origin[0] + self.x, self.grid.origin[1] + y)
+            if light_by_value[value]:
+                self.grid.lights.add(pos)
+            else:
+                self.grid.lights.discard(pos)
+        if grow_chance_by_value[old_value] or grow_chance_by_value[value]:
+            pos = (self.grid.origin[0] + self.x, self.grid.origin[1] + y)
+            self.grid.grow_due.pop(pos, None)
+            if grow_chance_by_value[value]:
+                self.grid.schedule_growth(pos, grow_chance_by_value[value])
+        self.ids[y] = value
+        if is_opaque_value[old_value] != is_opaque_value[value]:
+            self.grid.opacity_version += 1
+            if self.grid.layer is not None:
+                self.grid.layer.opacity_version += 1
+            self.grid.sight_changes.add((self.grid.origin[0] + self.x, self.grid.origin[1] + y))
+        if tile.health < tile.max_health:
+            self.grid.damage[(self.x, y)] = tile.max_health - tile.health
+        else:
+            self.grid.damage.pop((self.x, y), None)
+        if value != old_value and (is_spread_value[old_value] or is_spread_value[value]):
+            # The cell and its neighbours may have joined or left the spread frontier.
+            wx, wy = self.grid.origin[0] + self.x, self.grid.origin[1] + y
+            for cell in ((wx, wy), (wx - 1, wy), (wx + 1, wy), (wx, wy - 1), (wx, wy + 1)):
+                self.grid.update_frontier(*cell)
+
+
+class MobGrid:
+    """2D array of the mobs on a layer, array[x][y], that also keeps where each mob is.
+
+    Every write goes through MobGridColumn.__setitem__, so positions stays in
+    step with the array whether a mob spawns, moves, dies or is blown up, and
+    the tick can go through the mobs without scanning every cell. The mobs
+    are counted by MobID the same way, filed in MOB_BUCKET_SIZE square
+    buckets for finding the mobs near a point, and the ALWAYS_SIM ones and
+    the ones that give light kept apart. Each bucket also counts its mobs by
+    category, so category_count() adds up an area a bucket at a time.
+
+    Mobs outside the simulated area miss their daylight despawn rolls, so
+    each mob keeps the daylight_time it was last simulated at, and
+    missed_daylight() says how many it has to make up. sweep() hands out the
+    mobs of the area a few buckets at a time for making them up.
+    """
+    def __init__(self, array: "list[list] | ChunkedArray"):
+        self.array = array
+        self.positions: dict[Mob, tuple[int, int]] = {}
+        self.counts: Counter[MobID] = Counter()
+        # Dicts used as ordered sets, so the mobs always come out in the same order.
+        self.buckets: dict[tuple[int, int], dict[Mob, None]] = {}
+        self.bucket_counts: dict[tuple[int, int], Counter[MobCategory]] = {}
+        self.always_sim: dict[Mob, None] = {}
+        self.lights: dict[Mob, None] = {}
+        # The daylight ticks the layer has had, kept by the simulation, and when each mob last saw one.
+        self.daylight_time = 0
+        self.seen_at: dict[Mob, int] = {}
+        # Where sweep() got to in its round of the area's buckets.
+        self.sweep_index = 0
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __getitem__(self, x: int) -> "MobGridColumn":
+        return MobGridColumn(self, x, self.array[x])
+
+    def count(self, mob: Mob, amount: int):
+        self.counts[mob.id] += amount
+
+    def place(self, mob: Mob, pos: tuple[int, int]):
+        """Register mob as being at pos, moving it if it was somewhere else."""
+        old_pos = self.positions.get(mob)
+        if old_pos is None:
+            self.count(mob, 1)
+            if mob.tag_mask & ALWAYS_SIM_MASK:
+                self.always_sim[mob] = None
+            if mob.light > 0:
+                self.lights[mob] = None
+            self.seen_at[mob] = self.daylight_time
+        else:
+            self.unbucket(mob, old_pos)
+        self.positions[mob] = pos
+        key = (pos[0] // MOB_BUCKET_SIZE, pos[1] // MOB_BUCKET_SIZE)
+        if key not in self.buckets:
+            self.buckets[key] = {}
+            self.bucket_counts[key] = Counter()
+        self.buckets[key][mob] = None
+        self.bucket_counts[key][mob_category[mob.id]] += 1
+
+    def remove(self, mob: Mob):
+        """Forget mob, which has left the layer."""
+        self.unbucket(mob, self.positions.pop(mob))
+        self.count(mob, -1)
+        self.always_sim.pop(mob, None)
+        self.lights.pop(mob, None)
+        self.seen_at.pop(mob, None)
+
+    def missed_daylight(self, mob: Mob) -> int:
+        """Return the daylight ticks since mob was last simulated, and mark it simulated now."""
+        missed = self.daylight_time - self.seen_at[mob]
+        self.seen_at[mob] = self.daylight_time
+        return missed
+
+    def unbucket(self, mob: Mob, pos: tuple[int, int]):
+        key = (pos[0] // MOB_BUCKET_SIZE, pos[1] // MOB_BUCKET_SIZE)
+        bucket = self.buckets[key]
+        del bucket[mob]
+        if not bucket:
+            del self.buckets[key]
+            del self.bucket_counts[key]
+        else:
+            self.bucket_counts[key][mob_category[mob.id]] -= 1
+
+    def category_count(self, category: MobCategory, area_x: range, area_y: range) -> int:
+        """Return how many mobs of category are in the buckets overlapping the area.
+
+        The active areas are whole chunks, and so whole buckets, so for them
+        this is exactly the mobs in the area.
+        """
+        total = 0
+        for bucket_x in range(area_x.start // MOB_BUCKET_SIZE, (area_x.stop - 1) // MOB_BUCKET_SIZE + 1):
+            for bucket_y in range(area_y.start // MOB_BUCKET_SIZE, (area_y.stop - 1) // MOB_BUCKET_SIZE + 1):
+                counts = self.bucket_counts.get((bucket_x, bucket_y))
+                if counts is not None:
+                    total += counts[category]
+        return total
+
+    def sweep(self, area_x: range, area_y: range, buckets: int) -> list[tuple[Mob, tuple[int, int]]]:
+        """Return each mob in the next few buckets of the area, going round all of its buckets in turn."""
+        columns = range(area_x.start // MOB_BUCKET_SIZE, (area_x.stop - 1) // MOB_BUCKET_SIZE + 1)
+        rows = range(area_y.start // MOB_BUCKET_SIZE, (area_y.stop - 1) // MOB_BUCKET_SIZE + 1)
+        total = len(columns) * len(rows)
+        mobs = []
+        for _ in range(min(buckets, total)):
+            self.sweep_index = (self.sweep_index + 1) % total
+            key = (columns[self.sweep_index // len(rows)], rows[self.sweep_index % len(rows)])
+            for mob in self.buckets.get(key, ()):
+                mobs.append((mob, self.positions[mob]))
+        return mobs
+
+    def mobs_near(self, center: PointType, distance: int) -> list[tuple[Mob, tuple[int, int]]]:
+        """Return each mob within distance of center on both axes, then each ALWAYS_SIM mob further out.
+
+        Only the buckets overlapping that square are looked at, so the cost
+        doesn't grow with the size of the layer.
+        """
+        left, right = int(center[0]) - distance, int(center[0]) + distance
+        top, bottom = int(center[1]) - distance, int(center[1]) + distance
+        near = []
+        for bucket_x in range(left // MOB_BUCKET_SIZE, right // MOB_BUCKET_SIZE + 1):
+            for bucket_y in range(top // MOB_BUCKET_SIZE, bottom // MOB_BUCKET_SIZE + 1):
+                for mob in self.buckets.get((bucket_x, bucket_y), ()):
+                    x, y = self.positions[mob]
+                    if left <= x <= right and top <= y <= bottom:
+                        near.append((mob, (x, y)))
+        for mob in self.always_sim:
+            x, y = self.positions[mob]
+            if not (left <= x <= right and top <= y <= bottom):
+                near.append((mob, (x, y)))
+        return near
+
+
+class MobGridColumn:
+    """One x column of a MobGrid."""
+    __slots__ = ("grid", "x", "column")
+
+    def __init__(self, grid: MobGrid, x: int, column: "list | ChunkColumn"):
+        self.grid = grid
+        self.x = x
+        self.column = column
+
+    def __getitem__(self, y: int) -> Mob | None:
+        return self.column[y]
+
+    def __setitem__(self, y: int, mob: Mob | None):
+        old_mob = self.column[y]
+        self.column[y] = mob
+        # A mob moving is set at its new cell before the old one is cleared,
+        # so only forget it if it is still registered here.
+        if old_mob is not None and self.grid.positions.get(old_mob) == (self.x, y):
+            self.grid.remove(old_mob)
+        if mob is not None:
+            self.grid.place(mob, (self.x, y))
+
+
 class World:
-    """Container of layers."""
-    def __init__(self, size: tuple[int, int], world_seed: int):
+    """Container of layers.
+
+    Only a world with cache_layers set, one made from a seed that will be
+    played again, reads and writes its layers in the on-disk cache.
+    """
+    def __init__(self, size: tuple[int, int], world_seed: int, cache_layers: bool = False):
         self.size = size
         assert (size[0] >= 50 and size[1] >= 50), "Minimum world size is 50x50"
         self.seed = world_seed
-        self.mob_cap = (self.size[0] * self.size[1]) // 50
-        # Layers are generated when called.
-        self.overworld_layer = None
-        self.cave_layer = None
-        self.cavern_layer = None
-        self.hell_layer = None
-        self.sky_layer = None
+        self.cache_layers = cache_layers
+        self.chunked = size[0] > MAX_FLAT_WORLD_SIZE or size[1] > MAX_FLAT_WORLD_SIZE
+        # Chunked worlds only simulate the chunks around the player, and only
+        # the hostiles in those count against the cap.
+        active_size = (2 * ACTIVE_CHUNK_RADIUS + 1) * CHUNK_SIZE
+        if self.chunked:
+            self.mob_cap = (min(active_size, size[0]) * min(active_size, size[1])) // 50
+        else:
+            self.mob_cap = (self.size[0] * self.size[1]) // 50
+        # Layers are generated the first time they are asked for, from the top
+        # down, so a layer's up stairs are always known before it is built.
+        self.layers: dict[int, Layer] = {}
+        self.down_stairs: dict[int, list] = {}
+        # Down stairs of each generated chunk, keyed by (layer index, chunk position).
+        self.chunk_down_stairs: dict[tuple[int, tuple[int, int]], list] = {}
+        # prebuild_layer builds the next layer down in a thread while the player
+        # is still above it; the lock keeps it and get_layer from both building it.
+        self.layer_lock = threading.RLock()
+        self.prebuild_thread: threading.Thread | None = None
 
     def generate_layers(self):
-        yield "generating paradise..."
-        self.sky_layer, sky_stairs = self.generate_layer(generate_sky, [])
-        yield "generating overworld..."
-        self.overworld_layer, over_stairs = self.generate_layer(generate_overworld, sky_stairs)
-        yield "generating caves..."
-        self.cave_layer, cave_stairs = self.generate_layer(generate_caves, over_stairs)
-        yield "generating caverns..."
-        self.cavern_layer, cavern_stairs = self.generate_layer(generate_caverns, cave_stairs)
-        yield "generating underworld..."
-        self.hell_layer, _ = self.generate_layer(generate_hell, cavern_stairs)
-
-    def generate_layer(self, gen_func: Callable, upstairs: list) -> tuple[Layer, list]:
-        tile_array, stairs = gen_func(self.size, self.seed, upstairs)
-        mob_array = make_2d_array(self.size, None)
+        if self.chunked:
+            # Chunks are generated as the player gets near them.
+            yield "generating terrain..."
+            for index in STARTING_LAYERS:
+                self.layers[index] = self.build_chunked_layer(index)
+            return
+        # Only the sky and overworld are built up front.
+        if self.cache_layers:
+            yield "loading cached layers..."
+            for index in STARTING_LAYERS:
+                layer = self.load_layer(index)
+                if layer is not None:
+                    self.layers[index] = layer
+                    yield f"loaded {bulk_passes[layer_order[index]][0]}..."
+        for index in STARTING_LAYERS:
+            if index in self.layers:
+                continue
+            name, terrain, _ = bulk_passes[layer_order[index]]
+            yield f"generating {name}..."
+            world_map = terrain(self.size, self.seed)
+            yield f"building {name}..."
+            self.layers[index] = self.build_layer(index, world_map)
+
+    def get_layer(self, index: int) -> Layer:
+        """Return the layer at index, generating it if this is its first visit."""
+        layer = self.layers.get(index)
+        if layer is not None:
+            return layer
+        with self.layer_lock:
+            if index not in self.layers:
+                if self.chunked:
+                    self.layers[index] = self.build_chunked_layer(index)
+                else:
+                    self.layers[index] = self.load_layer(index)
+                if self.layers[index] is None:
+                    terrain = bulk_passes[layer_order[index]][1]
+                    self.layers[index] = self.build_layer(index, terrain(self.size, self.seed))
+            return self.layers[index]
+
+    def prebuild_layer(self, index: int):
+        """Start building the layer at index in a thread, so the stairs down to it don't stall the game."""
+        if self.chunked or index in self.layers or index >= len(layer_order):
+            return  # chunks are built as they are needed anyway
+        if self.prebuild_thread is not None and self.prebuild_thread.is_alive():
+            return
+        self.prebuild_thread = threading.Thread(target=self.get_layer, args=(index,), daemon=True)
+        self.prebuild_thread.start()
+
+    def build_layer(self, index: int, world_map: np.ndarray) -> Layer:
+        # The up stairs of this layer are the down stairs of the one above.
+        if index > 0 and index - 1 not in self.down_stairs:
+            self.get_layer(index - 1)
+        upstairs = self.down_stairs[index - 1] if index > 0 else []
+        name, _, stairs = bulk_passes[layer_order[index]]
+        self.down_stairs[index] = stairs(world_map, upstairs, stair_rng(self.seed, name))
+        if self.cache_layers:
+            save_cached_layer(self.seed, self.size, index, world_map, self.down_stairs[index])
+        tile_array = grid_to_tiles(world_map)
+        mob_array = MobGrid(make_2d_array(self.size, None))
         mem_array = make_2d_array(self.size, None)
-        return Layer(tile_array, mob_array, mem_array), stairs
+        return Layer(tile_array, mob_array, mem_array)
+
+    def load_layer(self, index: int) -> Layer | None:
+        """Build the layer at index from the cache, or return None if it isn't cached."""
+        if not self.cache_layers:
+            return None
+        cached = load_cached_layer(self.seed, self.size, index)
+        if cached is None:
+            return None
+        world_map, self.down_stairs[index] = cached
+        tile_array = grid_to_tiles(world_map)
+        mob_array = MobGrid(make_2d_array(self.size, None))
+        mem_array = make_2d_array(self.size, None)
+        return Layer(tile_array, mob_array, mem_array)
+
+    def build_chunked_layer(self, index: int) -> Layer:
+        tile_array = ChunkedArray(self.size, generate_chunk=lambda chunk_pos: self.build_chunk(
+            index, chunk_pos, tile_array))
+        mob_array = MobGrid(ChunkedArray(self.size, None))
+        mem_array = ChunkedArray(self.size, None)
+        return Layer(tile_array, mob_array, mem_array)
+
+    def build_chunk(self, index: int, chunk_pos: tuple[int, int], tile_array: ChunkedArray) -> TileGrid:
+        def find_grid(x: int, y: int) -> TileGrid | None:
+            return tile_array.chunks.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+
+        origin = (chunk_pos[0] * CHUNK_SIZE, chunk_pos[1] * CHUNK_SIZE)
+        grid = TileGrid(self.generate_chunk(index, chunk_pos), origin, find_grid, tile_array)
+        # Add the chunk before checking its edges, so the chunks around it see it too.
+        tile_array.chunks[chunk_pos] = grid
+        grid.refresh_edges()
+        return grid
+
+    def generate_chunk(self, index: int, chunk_pos: tuple[int, int]) -> np.ndarray:
+        """Generate the terrain and stairs of one chunk of a layer from the world seed."""
+        _, terrain, stairs = bulk_passes[layer_order[index]]
+        origin = (chunk_pos[0] * CHUNK_SIZE, chunk_pos[1] * CHUNK_SIZE)
+        rng = random.Random(f"{self.seed}-{index}-{chunk_pos[0]}-{chunk_pos[1]}")
+        world_map = terrain((CHUNK_SIZE, CHUNK_SIZE), self.seed, origin, rng)
+        # The up stairs of this chunk are the down stairs of the same chunk one layer up.
+        upstairs = []
+        if index > 0:
+            if (index - 1, chunk_pos) not in self.chunk_down_stairs:
+                self.generate_chunk(index - 1, chunk_pos)
+            upstairs = [(x - origin[0], y - origin[1]) for x, y in self.chunk_down_stairs[(index - 1, chunk_pos)]]
+        # Only place down stairs well inside both the chunk and the world.
+        allowed = []
+        for axis in (0, 1):
+            cells = np.arange(CHUNK_SIZE)
+            world_cells = cells + origin[axis]
+            allowed.append((cells >= CHUNK_STAIR_PAD) & (cells < CHUNK_SIZE - CHUNK_STAIR_PAD) &
+                           (world_cells >= STAIR_BORDER_PAD) & (world_cells < self.size[axis] - STAIR_BORDER_PAD))
+        down_stairs = stairs(world_map, upstairs, rng, np.outer(*allowed), stair_count(world_map.shape, rng))
+        self.chunk_down_stairs[(index, chunk_pos)] = [(x + origin[0], y + origin[1]) for x, y in down_stairs]
+        return world_map
+
+    def catch_up(self, index: int, world_time: int, center: PointType) -> bool:
+        """Fast-forward the grids around center of a layer to world_time, the last tick done.
+
+        A grid misses ticks while its layer isn't the player's, or while it is
+        a chunk outside the active area, so this runs on every tick and when
+        the player changes layers. Rather than replaying every tick it missed,
+        growth that came due is done from the growth heaps and spreading runs
+        at most CATCH_UP_SPREAD_STEPS array steps. All of it stops after
+        CATCH_UP_BUDGET seconds, so walking and changing layers stay quick.
+        The mobs make up their missed despawns in the world tick instead, when
+        they are next simulated or swept.
+
+        Returns whether any tile changed, so the caller knows to relight.
+        """
+        layer = self.get_layer(index)
+        area_x, area_y = self.active_area(center)
+        deadline = time.perf_counter() + CATCH_UP_BUDGET
+        changed = False
+        # Chunks that were never made have nothing to catch up on.
+        for grid in tile_grids(layer.tile_array, area_x, area_y, False):
+            if grid.time_offset is None:
+                grid.time_offset = world_time - grid.ticks  # new, so up to date
+                continue
+            missed = world_time - grid.time_offset - grid.ticks
+            if missed <= 0:
+                continue
+            changed |= grid.fast_forward(missed, deadline)
+            if grid.frontier:
+                grid_x = range(grid.origin[0], grid.origin[0] + grid.size[0])
+                grid_y = range(grid.origin[1], grid.origin[1] + grid.size[1])
+                for pos, tile_id in spread_cells(layer.tile_array, grid_x, grid_y,
+                                                 steps=min(missed, CATCH_UP_SPREAD_STEPS), deadline=deadline):
+                    set_array(pos, layer.tile_array, Tile(tile_id))
+                    changed = True
+        return changed
+
+    def make_array(self, default) -> "list[list] | ChunkedArray":
+        """Make a 2D array the size of a layer, chunked if the world is."""
+        if self.chunked:
+            return ChunkedArray(self.size, default)
+        return make_2d_array(self.size, default)
+
+    def active_area(self, center: PointType) -> tuple[range, range]:
+        """Return the x and y ranges of the cells that are simulated around center."""
+        if not self.chunked:
+            return range(self.size[0]), range(self.size[1])
+        ranges = []
+        for axis in (0, 1):
+            center_chunk = int(center[axis]) // CHUNK_SIZE
+            start = max(0, (center_chunk - ACTIVE_CHUNK_RADIUS) * CHUNK_SIZE)
+            stop = min(self.size[axis], (center_chunk + ACTIVE_CHUNK_RADIUS + 1) * CHUNK_SIZE)
+            ranges.append(range(start, stop))
+        return ranges[0], ranges[1]
+
+
+class BackgroundWorld:
+    """Generates a World in a worker thread so it is ready by the time it is needed."""
+    def __init__(self, size: tuple[int, int], world_seed: int, cache_layers: bool = False):
+        self.world = World(size, world_seed, cache_layers)
+        self.status = "generating terrain..."
+        self.finished = False
+        self.cancelled = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        generation = self.world.generate_layers()
+        for status in generation:
+            self.status = status
+            if self.cancelled:
+                generation.close()
+                return
+        self.finished = True
+
+    def cancel(self):
+        """Stop generating; the world is thrown away.
+
+        Generation stops before its next pass; call wait() to let the one running finish.
+        """
+        self.cancelled = True
+
+    def is_running(self) -> bool:
+        return self.thread.is_alive()
+
+    def wait(self, timeout: float | None = None):
+        self.thread.join(timeout)
 
 
 # World Gen functions below
@@ -134,26 +1043,23 @@ def generate_overworld(size: tuple[int, int], world_seed: int, upstairs: list) -
                     world_map[point[0]][point[1]] = Tile(TileID.UP_STAIRS)
                 else:
                     world_map[point[0] + x][point[1] + y] = Tile(TileID.OBSIDIAN_BRICKS)
-    for _ in range(number_of_stairs):
-        stair_not_done = True
-        while stair_not_done:
-            point = (random.randint(STAIR_BORDER_PAD, size[0] - STAIR_BORDER_PAD - 1),
-                     random.randint(STAIR_BORDER_PAD, size[1] - STAIR_BORDER_PAD - 1))
-            if distance_within_any(point, upstairs, STAIR_STAIR_PAD):
-                continue
-            if distance_within_any(point, down_stairs, STAIR_STAIR_PAD):
+    candidates = []
+    for x in range(STAIR_BORDER_PAD, size[0] - STAIR_BORDER_PAD):
+        for y in range(STAIR_BORDER_PAD, size[1] - STAIR_BORDER_PAD):
+            if distance_within_any((x, y), upstairs, STAIR_STAIR_PAD):
                 continue
             stone_count = 0
-            for x in (-1, 0, 1):
-                for y in (-1, 0, 1):
-                    if x == y == 0:
+            for nx in (-1, 0, 1):
+                for ny in (-1, 0, 1):
+                    if nx == ny == 0:
                         continue
-                    if world_map[point[0] + x][point[1] + y].id == TileID.STONE:
+                    if world_map[x + nx][y + ny].id == TileID.STONE:
                         stone_count += 1
             if 3 < stone_count < 7:
-                world_map[point[0]][point[1]] = Tile(TileID.DOWN_STAIRS)
-                down_stairs.append(point)
-                stair_not_done = False
+                candidates.append((x, y))
+    for point in pick_stairs(np.array(candidates).reshape(-1, 2), stair_rng(world_seed, "overworld"), number_of_stairs):
+        world_map[point[0]][point[1]] = Tile(TileID.DOWN_STAIRS)
+        down_stairs.append(point)
     return world_map, down_stairs
 
 
@@ -204,26 +1110,23 @@ def generate_caves(size: tuple[int, int], world_seed: int, upstairs: list) -> tu
                     world_map[point[0]][point[1]] = Tile(TileID.UP_STAIRS)
                 else:
                     world_map[point[0] + x][point[1] + y] = Tile(TileID.DIRT)
-    for _ in range(number_of_stairs):
-        stair_not_done = True
-        while stair_not_done:
-            point = (random.randint(STAIR_BORDER_PAD, size[0] - STAIR_BORDER_PAD - 1),
-                     random.randint(STAIR_BORDER_PAD, size[1] - STAIR_BORDER_PAD - 1))
-            if distance_within_any(point, upstairs, STAIR_STAIR_PAD):
-                continue
-            if distance_within_any(point, down_stairs, STAIR_STAIR_PAD):
+    candidates = []
+    for x in range(STAIR_BORDER_PAD, size[0] - STAIR_BORDER_PAD):
+        for y in range(STAIR_BORDER_PAD, size[1] - STAIR_BORDER_PAD):
+            if distance_within_any((x, y), upstairs, STAIR_STAIR_PAD):
                 continue
             stone_count = 0
-            for x in (-1, 0, 1):
-                for y in (-1, 0, 1):
-                    if x == y == 0:
+            for nx in (-1, 0, 1):
+                for ny in (-1, 0, 1):
+                    if nx == ny == 0:
                         continue
-                    if world_map[point[0] + x][point[1] + y].id in (TileID.STONE, TileID.IRON_ORE, TileID.LAPIS_ORE):
+                    if world_map[x + nx][y + ny].id in (TileID.STONE, TileID.IRON_ORE, TileID.LAPIS_ORE):
                         stone_count += 1
             if 3 < stone_count < 7:
-                world_map[point[0]][point[1]] = Tile(TileID.DOWN_STAIRS)
-                down_stairs.append(point)
-                stair_not_done = False
+                candidates.append((x, y))
+    for point in pick_stairs(np.array(candidates).reshape(-1, 2), stair_rng(world_seed, "caves"), number_of_stairs):
+        world_map[point[0]][point[1]] = Tile(TileID.DOWN_STAIRS)
+        down_stairs.append(point)
     return world_map, down_stairs
 
 
@@ -283,26 +1186,23 @@ def generate_caverns(size: tuple[int, int], world_seed: int, upstairs: list) ->
                     world_map[point[0]][point[1]] = Tile(TileID.UP_STAIRS)
                 else:
                     world_map[point[0] + x][point[1] + y] = Tile(TileID.DIRT)
-    for _ in range(number_of_stairs):
-        stair_not_done = True
-        while stair_not_done:
-            point = (random.randint(STAIR_BORDER_PAD, size[0] - STAIR_BORDER_PAD - 1),
-                     random.randint(STAIR_BORDER_PAD, size[1] - STAIR_BORDER_PAD - 1))
-            if distance_within_any(point, upstairs, STAIR_STAIR_PAD):
-                continue
-            if distance_within_any(point, down_stairs, STAIR_STAIR_PAD):
+    candidates = []
+    for x in range(STAIR_BORDER_PAD, size[0] - STAIR_BORDER_PAD):
+        for y in range(STAIR_BORDER_PAD, size[1] - STAIR_BORDER_PAD):
+            if distance_within_any((x, y), upstairs, STAIR_STAIR_PAD):
                 continue
             stone_count = 0
-            for x in (-1, 0, 1):
-                for y in (-1, 0, 1):
-                    if x == y == 0:
+            for nx in (-1, 0, 1):
+                for ny in (-1, 0, 1):
+                    if nx == ny == 0:
                         continue
-                    if world_map[point[0] + x][point[1] + y].id in (TileID.STONE, TileID.GOLD_ORE, TileID.LAPIS_ORE):
+                    if world_map[x + nx][y + ny].id in (TileID.STONE, TileID.GOLD_ORE, TileID.LAPIS_ORE):
                         stone_count += 1
             if 3 < stone_count < 7:
-                world_map[point[0]][point[1]] = Tile(TileID.DOWN_STAIRS)
-                down_stairs.append(point)
-                stair_not_done = False
+                candidates.append((x, y))
+    for point in pick_stairs(np.array(candidates).reshape(-1, 2), stair_rng(world_seed, "caverns"), number_of_stairs):
+        world_map[point[0]][point[1]] = Tile(TileID.DOWN_STAIRS)
+        down_stairs.append(point)
     return world_map, down_stairs
 
 
@@ -393,11 +1293,9 @@ def generate_sky(size: tuple[int, int], world_seed: int, upstairs: list) -> tupl
                         world_map[x][y] = Tile(TileID.AIR)
             elif value < 1:
                 world_map[x][y] = Tile(TileID.CLOUD_BANK)
-    for _ in range(number_of_stairs):
-        point = (random.randint(STAIR_BORDER_PAD, size[0] - STAIR_BORDER_PAD - 1),
-                 random.randint(STAIR_BORDER_PAD, size[1] - STAIR_BORDER_PAD - 1))
-        if distance_within_any(point, down_stairs, STAIR_STAIR_PAD):
-            continue  # don't spawn too near any other staircases
+    candidates = [(x, y) for x in range(STAIR_BORDER_PAD, size[0] - STAIR_BORDER_PAD)
+                  for y in range(STAIR_BORDER_PAD, size[1] - STAIR_BORDER_PAD)]
+    for point in pick_stairs(np.array(candidates).reshape(-1, 2), stair_rng(world_seed, "paradise"), number_of_stairs):
         for x in range(-4, 5):
             for y in range(-4, 5):
                 if x == y == 0:
@@ -406,3 +1304,337 @@ def generate_sky(size: tuple[int, int], world_seed: int, upstairs: list) -> tupl
                     world_map[point[0] + x][point[1] + y] = Tile(TileID.CLOUD)
         down_stairs.append(point)
     return world_map, down_stairs
+
+
+# Bulk world gen functions below.
+# These build the same tile grids as the per-cell functions above, but fill
+# whole noise fields at once and pick biomes with boolean masks.
+value_to_tileid = {tile_id.value: tile_id for tile_id in TileID}
+# The shared Tile of each TileID value, for reading TileGrids.
+tile_by_value = [Tile(value_to_tileid[value]) if value in value_to_tileid else None for value in range(256)]
+# Tiles the world tick visits: bones that rise as skeletons. Growing tiles are scheduled instead.
+active_tile_ids = (TileID.DESERT_BONES, TileID.ASH_BONES)
+is_active_value = bytearray(256)
+for tile_id in active_tile_ids:
+    is_active_value[tile_id.value] = 1
+is_opaque_value = bytearray(256)
+for tile_id in TileID:
+    is_opaque_value[tile_id.value] = Tile(tile_id).has_tag(TileTag.BLOCK_SIGHT)
+light_by_value = bytearray(256)
+for tile_id, radius in tile_light.items():
+    light_by_value[tile_id.value] = radius
+grow_chance_by_value = [0.0] * 256
+for tile_id, (_, chance) in tile_grow.items():
+    grow_chance_by_value[tile_id.value] = chance
+# What each spreading tile can spread onto, or reacts with when they touch.
+spread_targets = {tile_id: {spread_onto} for tile_id, (spread_onto, _) in tile_spread.items()}
+spread_targets[TileID.WATER].add(TileID.LAVA)
+spread_targets[TileID.LAVA].add(TileID.WATER)
+spread_target_values = [frozenset()] * 256
+is_spread_value = bytearray(256)
+for tile_id, targets in spread_targets.items():
+    spread_target_values[tile_id.value] = frozenset(target.value for target in targets)
+    is_spread_value[tile_id.value] = 1
+    for target in targets:
+        is_spread_value[target.value] = 1
+
+
+def grid_to_tiles(world_map: np.ndarray, origin: PointType = (0, 0)) -> TileGrid:
+    """Build a tile_array from a grid of TileID values."""
+    return TileGrid(world_map, origin)
+
+
+def tiles_to_grid(tile_array: list[list] | TileGrid) -> np.ndarray:
+    """Build a grid of TileID values from a tile_array."""
+    if isinstance(tile_array, TileGrid):
+        return tile_array.to_grid()
+    return np.array([[tile.id.value for tile in column] for column in tile_array], dtype=np.uint8)
+
+
+def roll_grid(rng: random.Random, mask: np.ndarray) -> np.ndarray:
+    """Draw one rng.random() per masked cell, in the same x-then-y order as the per-cell loops."""
+    rolls = np.zeros(mask.shape)
+    rolls[mask] = [rng.random() for _ in range(np.count_nonzero(mask))]
+    return rolls
+
+
+def place_up_stairs(world_map: np.ndarray, upstairs: list, surround: TileID):
+    for point in upstairs:
+        world_map[point[0] - 1:point[0] + 2, point[1] - 1:point[1] + 2] = surround.value
+        world_map[point[0], point[1]] = TileID.UP_STAIRS.value
+
+
+def stair_rng(world_seed: int, name: str) -> random.Random:
+    """Return the rng a whole layer places its down stairs with."""
+    return random.Random(f"{world_seed}-{name}-stairs")
+
+
+def stair_count(size: tuple[int, int], rng: random.Random) -> int:
+    """Roll how many down stairs an area gets, one per 1500 cells on average."""
+    expected = (size[0] * size[1]) / 1500
+    return int(expected) + (rng.random() < expected % 1)
+
+
+def border_mask(size: tuple[int, int]) -> np.ndarray:
+    """Return which cells are at least STAIR_BORDER_PAD away from the edge."""
+    allowed = np.zeros(size, dtype=bool)
+    allowed[STAIR_BORDER_PAD:size[0] - STAIR_BORDER_PAD, STAIR_BORDER_PAD:size[1] - STAIR_BORDER_PAD] = True
+    return allowed
+
+
+def stair_candidates(allowed: np.ndarray, points: list, pad: int | float) -> np.ndarray:
+    """Return allowed with every cell within pad of any of points cleared."""
+    x, y = np.indices(allowed.shape)
+    candidates = allowed.copy()
+    for point in points:
+        candidates &= (x - point[0]) ** 2 + (y - point[1]) ** 2 > pad ** 2
+    return candidates
+
+
+def pick_stairs(candidates: np.ndarray, rng: random.Random, number_of_stairs: int) -> list:
+    """Pick up to number_of_stairs of the candidate points, none within STAIR_STAIR_PAD of another."""
+    down_stairs: list[tuple[int, int]] = []
+    for _ in range(number_of_stairs):
+        if not len(candidates):
+            break  # nowhere left to put stairs
+        point = tuple(candidates[rng.randrange(len(candidates))].tolist())
+        down_stairs.append(point)
+        candidates = candidates[((candidates - point) ** 2).sum(axis=1) > STAIR_STAIR_PAD ** 2]
+    return down_stairs
+
+
+def place_down_stairs(world_map: np.ndarray, upstairs: list, stone: tuple[TileID, ...], rng: random.Random,
+                      allowed: np.ndarray | None, number_of_stairs: int | None) -> list:
+    """Place down stairs on cells with 4 to 6 stone neighbours that are far enough from the up stairs."""
+    if allowed is None:
+        allowed = border_mask(world_map.shape)
+    if number_of_stairs is None:
+        number_of_stairs = round((world_map.shape[0] * world_map.shape[1]) // 1500)
+    is_stone = np.isin(world_map, [tile_id.value for tile_id in stone])
+    # Stone in the 8 cells around each cell.
+    padded = np.pad(is_stone, 1).astype(np.int8)
+    stone_count = sum(padded[1 + dx:padded.shape[0] - 1 + dx, 1 + dy:padded.shape[1] - 1 + dy]
+                      for dx in (-1, 0, 1) for dy in (-1, 0, 1)) - is_stone
+    candidates = stair_candidates(allowed & (stone_count > 3) & (stone_count < 7), upstairs, STAIR_STAIR_PAD)
+    down_stairs = pick_stairs(np.argwhere(candidates), rng, number_of_stairs)
+    for point in down_stairs:
+        world_map[point] = TileID.DOWN_STAIRS.value
+    return down_stairs
+
+
+def overworld_terrain(size: tuple[int, int], world_seed: int, origin: PointType = (0, 0),
+                      rng: random.Random | None = None) -> np.ndarray:
+    world_map = np.full(size, TileID.GRASS.value, dtype=np.uint8)
+    perm = noise_permutation(world_seed)
+    rng = rng or random.Random(world_seed)
+    value = noise_grid(perm, size, 0.08, origin)
+    humidity = noise_grid(perm, size, 0.07, (origin[0] + 300, origin[1] + 300))
+    beach = (value >= -0.2) & (value < 0)
+    land = (value >= 0) & (value < 0.5)
+    desert = land & (humidity < -0.4)
+    forest = land & (humidity >= 0) & (humidity < 1)
+    mountain = (value >= 0.5) & (value < 1)
+    roll = roll_grid(rng, beach | desert | forest | mountain)
+    world_map[value < -0.2] = TileID.WATER.value
+    world_map[beach] = TileID.SAND.value
+    world_map[beach & (roll > 0.95) & (humidity >= -0.4)] = TileID.PALM_TREE.value
+    world_map[desert] = TileID.SAND.value
+    world_map[desert & (roll > 0.95)] = TileID.CACTUS.value
+    world_map[desert & (roll > 0.98)] = TileID.DESERT_BONES.value
+    world_map[forest & (roll + humidity > 1)] = TileID.TREE.value
+    world_map[mountain] = TileID.COAL_ORE.value
+    world_map[mountain & (roll < 0.95)] = TileID.STONE.value
+    return world_map
+
+
+def overworld_stairs(world_map: np.ndarray, upstairs: list, rng: random.Random,
+                     allowed: np.ndarray | None = None, number_of_stairs: int | None = None) -> list:
+    place_up_stairs(world_map, upstairs, TileID.OBSIDIAN_BRICKS)
+    return place_down_stairs(world_map, upstairs, (TileID.STONE,), rng, allowed, number_of_stairs)
+
+
+def caves_terrain(size: tuple[int, int], world_seed: int, origin: PointType = (0, 0),
+                  rng: random.Random | None = None) -> np.ndarray:
+    world_map = np.full(size, TileID.DIRT.value, dtype=np.uint8)
+    perm = noise_permutation(world_seed)
+    rng = rng or random.Random(world_seed)
+    altitude = noise_grid(perm, size, 0.08, (origin[0] + 400, origin[1] + 400))
+    ore = noise_grid(perm, size, 0.2, (origin[0] + 100, origin[1] + 100))
+    biome = noise_grid(perm, size, 0.1, origin)
+    floor = altitude < 0
+    webs = floor & (biome < -0.3)
+    thorns = floor & (biome < 0.5)
+    rock = (altitude >= 0) & (altitude < 0.7)
+    stone = rock & (ore >= -0.5)
+    # Cells that miss their web roll take a second roll for thorns, so the
+    # rolls are drawn one cell at a time to stay in step with generate_caves.
+    roll = np.zeros(size)
+    thorn_roll = np.zeros(size)
+    rolled = np.flatnonzero(thorns | stone)
+    second_rolled = []
+    second_rolls = []
+    first_rolls = []
+    for index, web_cell, cell_biome in zip(rolled.tolist(), webs.flat[rolled].tolist(), biome.flat[rolled].tolist()):
+        first_rolls.append(rng.random())
+        if web_cell and first_rolls[-1] + cell_biome >= 0.2:
+            second_rolled.append(index)
+            second_rolls.append(rng.random())
+    roll.flat[rolled] = first_rolls
+    thorn_roll.flat[rolled] = first_rolls
+    thorn_roll.flat[second_rolled] = second_rolls
+    web_hit = webs & (roll + biome < 0.2)
+    world_map[web_hit] = TileID.WEB.value
+    world_map[thorns & ~web_hit & (thorn_roll > 0.98)] = TileID.THORNS.value
+    world_map[floor & (biome >= 0.5)] = TileID.SAND.value
+    world_map[rock & (ore < -0.5)] = TileID.IRON_ORE.value
+    world_map[stone] = TileID.COAL_ORE.value
+    world_map[stone & (roll < 0.95)] = TileID.STONE.value
+    world_map[altitude >= 0.7] = TileID.LAPIS_ORE.value
+    return world_map
+
+
+def caves_stairs(world_map: np.ndarray, upstairs: list, rng: random.Random,
+                 allowed: np.ndarray | None = None, number_of_stairs: int | None = None) -> list:
+    place_up_stairs(world_map, upstairs, TileID.DIRT)
+    stone = (TileID.STONE, TileID.IRON_ORE, TileID.LAPIS_ORE)
+    return place_down_stairs(world_map, upstairs, stone, rng, allowed, number_of_stairs)
+
+
+def caverns_terrain(size: tuple[int, int], world_seed: int, origin: PointType = (0, 0),
+                    rng: random.Random | None = None) -> np.ndarray:
+    world_map = np.full(size, TileID.DIRT.value, dtype=np.uint8)
+    perm = noise_permutation(world_seed)
+    rng = rng or random.Random(world_seed)
+    altitude = noise_grid(perm, size, 0.08, (origin[0] + 500, origin[1] + 500))
+    ore = noise_grid(perm, size, 0.2, (origin[0] + 250, origin[1] + 250))
+    biome = noise_grid(perm, size, 0.1, origin)
+    water = noise_grid(perm, size, 0.08, (origin[0] + 300, origin[1] + 300))
+    floor = altitude < 0
+    fungus = floor & (biome < -0.3)
+    mushrooms = floor & (biome >= -0.3) & (biome < 0.5)
+    rock = (altitude >= 0) & (altitude < 0.7)
+    stone = rock & (ore >= -0.5)
+    roll = roll_grid(rng, fungus | mushrooms | stone)
+    world_map[fungus] = TileID.FLOOR_FUNGUS.value
+    world_map[fungus & (roll + biome > 0.2)] = TileID.BIG_MUSHROOM.value
+    world_map[mushrooms & (roll > 0.98)] = TileID.BIG_MUSHROOM.value
+    world_map[floor & (biome >= 0.5)] = TileID.SAND.value
+    world_map[rock & (ore < -0.5)] = TileID.GOLD_ORE.value
+    world_map[stone] = TileID.COAL_ORE.value
+    world_map[stone & (roll < 0.95)] = TileID.STONE.value
+    world_map[altitude >= 0.7] = TileID.LAPIS_ORE.value
+    world_map[water < -0.2] = TileID.WATER.value
+    return world_map
+
+
+def caverns_stairs(world_map: np.ndarray, upstairs: list, rng: random.Random,
+                   allowed: np.ndarray | None = None, number_of_stairs: int | None = None) -> list:
+    place_up_stairs(world_map, upstairs, TileID.DIRT)
+    stone = (TileID.STONE, TileID.GOLD_ORE, TileID.LAPIS_ORE)
+    return place_down_stairs(world_map, upstairs, stone, rng, allowed, number_of_stairs)
+
+
+def hell_terrain(size: tuple[int, int], world_seed: int, origin: PointType = (0, 0),
+                 rng: random.Random | None = None) -> np.ndarray:
+    world_map = np.full(size, TileID.DIRT.value, dtype=np.uint8)
+    perm = noise_permutation(world_seed)
+    rng = rng or random.Random(world_seed)
+    altitude = noise_grid(perm, size, 0.08, (origin[0] + 700, origin[1] + 700))
+    ore = noise_grid(perm, size, 0.2, (origin[0] + 600, origin[1] + 600))
+    biome = noise_grid(perm, size, 0.1, origin)
+    water = noise_grid(perm, size, 0.08, (origin[0] + 450, origin[1] + 450))
+    floor = altitude < 0
+    webs = floor & (biome < -0.3)
+    bones = floor & (biome >= -0.3) & (biome < 0.2)
+    ash = floor & (biome >= 0.2)
+    rock = (altitude >= 0) & (altitude < 0.7)
+    stone = rock & (ore >= -0.5)
+    roll = roll_grid(rng, floor | stone)
+    world_map[webs & (roll + biome < 0.2)] = TileID.WEB.value
+    world_map[bones & (roll > 0.98)] = TileID.ASH_BONES.value
+    world_map[ash] = TileID.ASH.value
+    world_map[ash & (roll > 0.9)] = TileID.LAVA.value
+    world_map[rock & (ore < -0.5)] = TileID.GEM_ORE.value
+    world_map[stone] = TileID.COAL_ORE.value
+    world_map[stone & (roll < 0.95)] = TileID.STONE.value
+    world_map[altitude >= 0.7] = TileID.LAPIS_ORE.value
+    world_map[water < -0.2] = TileID.LAVA.value
+    return world_map
+
+
+def hell_stairs(world_map: np.ndarray, upstairs: list, rng: random.Random,
+                allowed: np.ndarray | None = None, number_of_stairs: int | None = None) -> list:
+    place_up_stairs(world_map, upstairs, TileID.DIRT)
+    return []  # hell doesn't go down any further
+
+
+def sky_terrain(size: tuple[int, int], world_seed: int, origin: PointType = (0, 0),
+                rng: random.Random | None = None) -> np.ndarray:
+    world_map = np.full(size, TileID.CLOUD.value, dtype=np.uint8)
+    perm = noise_permutation(world_seed)
+    rng = rng or random.Random(world_seed)
+    value = noise_grid(perm, size, 0.08, origin)
+    humidity = noise_grid(perm, size, 0.07, (origin[0] + 300, origin[1] + 300))
+    land = (value >= 0) & (value < 0.5)
+    quartz = land & (humidity < -0.4)
+    holes = land & (humidity >= 0) & (humidity < 1)
+    roll = roll_grid(rng, quartz | holes)
+    world_map[value < 0] = TileID.AIR.value
+    world_map[quartz & (roll > 0.9)] = TileID.QUARTZ_ORE.value
+    world_map[holes & (roll + humidity > 1.2)] = TileID.AIR.value
+    world_map[(value >= 0.5) & (value < 1)] = TileID.CLOUD_BANK.value
+    return world_map
+
+
+def sky_stairs(world_map: np.ndarray, upstairs: list, rng: random.Random,
+               allowed: np.ndarray | None = None, number_of_stairs: int | None = None) -> list:
+    if allowed is None:
+        allowed = border_mask(world_map.shape)
+    if number_of_stairs is None:
+        number_of_stairs = round((world_map.shape[0] * world_map.shape[1]) // 1500)
+    down_stairs = pick_stairs(np.argwhere(allowed), rng, number_of_stairs)
+    for point in down_stairs:
+        for x in range(-4, 5):
+            for y in range(-4, 5):
+                if x == y == 0:
+                    world_map[point] = TileID.DOWN_STAIRS.value
+                elif distance_within((0, 0), (x, y), 3.5):
+                    world_map[point[0] + x, point[1] + y] = TileID.CLOUD.value
+    return down_stairs
+
+
+# The terrain pass of each layer only needs the size and seed, so the passes
+# can run in any order; the stair pass needs the stairs of the layer above.
+bulk_passes = {
+    generate_sky: ("paradise", sky_terrain, sky_stairs),
+    generate_overworld: ("overworld", overworld_terrain, overworld_stairs),
+    generate_caves: ("caves", caves_terrain, caves_stairs),
+    generate_caverns: ("caverns", caverns_terrain, caverns_stairs),
+    generate_hell: ("underworld", hell_terrain, hell_stairs),
+}
+# Layer indices from the sky down, as used by main.
+layer_order = tuple(bulk_passes)
+SKY_LAYER = 0
+OVERWORLD_LAYER = 1
+STARTING_LAYERS = (SKY_LAYER, OVERWORLD_LAYER)
+
+
+def generate_bulk(gen_func: Callable, size: tuple[int, int], world_seed: int,
+                  upstairs: list) -> tuple[list[list], list]:
+    """Bulk equivalent of calling gen_func(size, world_seed, upstairs)."""
+    name, terrain, stairs = bulk_passes[gen_func]
+    world_map = terrain(size, world_seed)
+    down_stairs = stairs(world_map, upstairs, stair_rng(world_seed, name))
+    return grid_to_tiles(world_map), down_stairs
+
+
+def bulk_generation_matches(size: tuple[int, int], world_seed: int) -> bool:
+    """Generate every layer both per cell and in bulk, and check the tile grids are identical."""
+    upstairs = []
+    for gen_func in bulk_passes:
+        tile_array, stairs = gen_func(size, world_seed, upstairs)
+        bulk_array, bulk_stairs = generate_bulk(gen_func, size, world_seed, upstairs)
+        if stairs != bulk_stairs or not np.array_equal(tiles_to_grid(tile_array), tiles_to_grid(bulk_array)):
+            return False
+        upstairs = stairs
+    return True